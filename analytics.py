@@ -0,0 +1,215 @@
+"""Vectorized portfolio analytics over a user's trade ledger.
+
+A user's trades are loaded once into columnar NumPy arrays, grouped by
+symbol (chronological within each symbol), and every figure is computed with
+array operations rather than a per-trade Python loop:
+
+- FIFO cost basis matches cumulative sold quantity against the cumulative
+  buy lots with one searchsorted over all symbols at once.
+- Average cost is a linear recurrence (a buy blends into the running average,
+  a sell leaves it alone), solved with a log2(n)-pass parallel prefix scan.
+"""
+import numpy as np
+
+BUY = "Bought"
+METHODS = ("fifo", "average")
+
+
+# One ledger row as it comes off the cursor; NULL prices become NaN
+_ROW = np.dtype([("name", object), ("type", "U6"), ("qty", "f8"), ("price", "f8")])
+
+
+class Trades:
+    """A user's ledger as columnar arrays, grouped by symbol."""
+
+    def __init__(self, names, types, qty, price):
+        # Factorize through a dict: np.unique would sort every symbol string
+        index = {}
+        codes = np.fromiter((index.setdefault(n, len(index)) for n in names),
+                            dtype=np.intp, count=len(qty))
+        self.symbols = np.array(list(index), dtype=object)
+        # Stable sort keeps each symbol's trades in ledger order
+        order = np.argsort(codes, kind="stable")
+        self.code = codes[order]
+        self.is_buy = (np.asarray(types) == BUY)[order]
+        self.qty = np.asarray(qty, dtype=np.float64)[order]
+        self.price = np.asarray(price, dtype=np.float64)[order]
+        self.signed_qty = np.where(self.is_buy, self.qty, -self.qty)
+
+    @classmethod
+    def from_rows(cls, rows, fallback_prices=None):
+        """Build from (name, type, qty, price) rows, e.g. a DB-API fetchall().
+
+        Trades recorded before prices were stored have price None; they take
+        the symbol's entry in `fallback_prices` (or 0.0) instead.
+        """
+        cols = np.array(rows, dtype=_ROW)
+        price = cols["price"]
+        missing = np.isnan(price)
+        if missing.any():
+            fallback = fallback_prices or {}
+            price[missing] = [fallback.get(n) or 0.0 for n in cols["name"][missing]]
+        return cls(cols["name"], cols["type"], cols["qty"], price)
+
+    def __len__(self):
+        return len(self.qty)
+
+    def _per_symbol(self, values):
+        return np.bincount(self.code, weights=values, minlength=len(self.symbols))
+
+    def position(self):
+        """Running position after each trade, restarting at each symbol."""
+        running = np.cumsum(self.signed_qty)
+        starts = np.searchsorted(self.code, np.arange(len(self.symbols)))
+        before = np.concatenate(([0.0], running))[starts]
+        return running - before[self.code]
+
+    def open_qty(self):
+        return self._per_symbol(self.signed_qty)
+
+
+def fifo(trades):
+    """Returns (realized P&L per trade, open cost basis per symbol)."""
+    n_symbols = len(trades.symbols)
+    if not len(trades):
+        return np.zeros(0), np.zeros(n_symbols)
+
+    buy_qty = np.where(trades.is_buy, trades.qty, 0.0)
+    sell_qty = trades.qty - buy_qty
+
+    # All symbols' buy lots laid end to end on one share axis
+    lot_end = np.cumsum(buy_qty)
+    lot_cost = np.cumsum(buy_qty * trades.price)
+    is_lot = trades.is_buy & (trades.qty > 0)
+    ends, costs, prices = lot_end[is_lot], lot_cost[is_lot], trades.price[is_lot]
+
+    if not len(ends):
+        return np.zeros(len(trades)), np.zeros(n_symbols)
+
+    def cost_of_first(shares):
+        # Cost of the first `shares` shares on that axis, partial lots included
+        i = np.minimum(np.searchsorted(ends, shares, side="left"), len(ends) - 1)
+        prev_end = np.where(i > 0, ends[i - 1], 0.0)
+        prev_cost = np.where(i > 0, costs[i - 1], 0.0)
+        return prev_cost + (shares - prev_end) * prices[i]
+
+    # Each symbol's stretch of the axis; sells are clamped to it so a ledger
+    # that oversold can't consume another symbol's lots
+    first = np.searchsorted(trades.code, np.arange(n_symbols))
+    axis_start = (lot_end - buy_qty)[first]
+    bought = np.bincount(trades.code, weights=buy_qty, minlength=n_symbols)
+    axis_end = axis_start + bought
+
+    sold = np.cumsum(sell_qty)
+    sold -= np.concatenate(([0.0], sold))[first][trades.code]
+    after = np.minimum(axis_start[trades.code] + sold, axis_end[trades.code])
+    # Each trade starts where the previous one in its symbol ended
+    consumed = cost_of_first(after)
+    consumed_before = np.concatenate(([0.0], consumed[:-1]))
+    consumed_before[first] = cost_of_first(axis_start)
+    cost = consumed - consumed_before
+    realized = np.where(trades.is_buy, 0.0, sell_qty * trades.price - cost)
+
+    bought_cost = np.bincount(trades.code, weights=buy_qty * trades.price,
+                              minlength=n_symbols)
+    sold_cost = np.bincount(trades.code, weights=np.where(trades.is_buy, 0.0, cost),
+                            minlength=n_symbols)
+    return realized, bought_cost - sold_cost
+
+
+def _linear_scan(a, b):
+    """x[k] = a[k] * x[k - 1] + b[k] for every k, with x[-1] = 0.
+
+    Hillis-Steele scan over the affine maps (a, b): after the pass with step
+    s, each entry is the composition of the 2s maps ending at it. With every
+    a in [0, 1] nothing can overflow, and a = 0 restarts the recurrence.
+    """
+    a, b = a.copy(), b.copy()
+    step = 1
+    while step < len(a):
+        b[step:] += a[step:] * b[:-step]
+        a[step:] *= a[:-step]
+        step *= 2
+    return b
+
+
+def average_cost(trades):
+    """Returns (realized P&L per trade, open cost basis per symbol).
+
+    After a buy, avg = (prev_pos * prev_avg + qty * price) / pos; a sell
+    realizes qty * (price - avg) and leaves avg unchanged.
+    """
+    n_symbols = len(trades.symbols)
+    if not len(trades):
+        return np.zeros(0), np.zeros(n_symbols)
+
+    pos = trades.position()
+    prev_pos = np.maximum(pos - trades.signed_qty, 0.0)
+    buys = trades.is_buy & (pos > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # A buy into a flat position (or a new symbol) has a = 0, which restarts avg
+        a = np.where(buys, prev_pos / pos, 1.0)
+        b = np.where(buys, trades.qty * trades.price / pos, 0.0)
+    # A symbol whose ledger opens with a sell must not inherit the previous symbol's avg
+    a[np.searchsorted(trades.code, np.arange(n_symbols))] = 0.0
+    avg = _linear_scan(a, b)
+
+    realized = np.where(trades.is_buy, 0.0, trades.qty * (trades.price - avg))
+    last = np.searchsorted(trades.code, np.arange(n_symbols), side="right") - 1
+    open_cost = np.where(last >= 0, pos[last] * avg[last], 0.0)
+    return realized, open_cost
+
+
+def report(trades, prices, cash, method="fifo"):
+    """Per-symbol and total figures as a JSON-ready dict.
+
+    `prices` maps symbols to current prices; symbols without one are valued
+    at their last trade price.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown cost basis method {method!r}")
+    realized, open_cost = (fifo if method == "fifo" else average_cost)(trades)
+
+    n_symbols = len(trades.symbols)
+    qty = trades.open_qty()
+    realized_by_symbol = np.bincount(trades.code, weights=realized, minlength=n_symbols)
+    last = np.searchsorted(trades.code, np.arange(n_symbols), side="right") - 1
+    last_price = trades.price[last] if len(trades) else np.zeros(0)
+    current = np.array([prices.get(s) or p for s, p in zip(trades.symbols, last_price)],
+                       dtype=np.float64)
+    value = qty * current
+    unrealized = value - open_cost
+    invested = np.bincount(trades.code,
+                           weights=np.where(trades.is_buy, trades.qty * trades.price, 0.0),
+                           minlength=n_symbols)
+    total = float(value.sum()) + cash
+    weights = value / total if total else np.zeros(n_symbols)
+
+    positions = [
+        {
+            "symbol": str(trades.symbols[i]),
+            "qty": float(qty[i]),
+            "price": float(current[i]),
+            "value": float(value[i]),
+            "cost_basis": float(open_cost[i]),
+            "avg_cost": float(open_cost[i] / qty[i]) if qty[i] else None,
+            "realized_pnl": float(realized_by_symbol[i]),
+            "unrealized_pnl": float(unrealized[i]),
+            "weight": float(weights[i]),
+        }
+        for i in sorted(range(n_symbols), key=lambda i: trades.symbols[i])
+    ]
+    pnl = float(realized_by_symbol.sum() + unrealized.sum())
+    return {
+        "method": method,
+        "trades": len(trades),
+        "positions": positions,
+        "cash": cash,
+        "cash_weight": cash / total if total else 0.0,
+        "market_value": float(value.sum()),
+        "total_value": total,
+        "invested": float(invested.sum()),
+        "realized_pnl": float(realized_by_symbol.sum()),
+        "unrealized_pnl": float(unrealized.sum()),
+        "return": pnl / float(invested.sum()) if invested.sum() else 0.0,
+    }
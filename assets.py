@@ -0,0 +1,164 @@
+"""Build step for static assets: fingerprint, precompress, re-encode.
+
+    python assets.py                    # static/ -> build/assets/
+    python assets.py --webp --quality 80
+
+Every file under static/ is copied to the output directory as
+name.<content hash>.ext, so its URL changes whenever its bytes do and it can
+be cached for a year as immutable. Text assets also get .gz (and .br, when
+the brotli package is installed) siblings, and with --webp images get a
+.webp variant when Pillow is installed and it comes out smaller.
+manifest.json maps each source path to its built names; AssetManifest reads
+it at run time and serves the best encoding the client accepts.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(ROOT, "static")
+BUILD_DIR = os.path.join(ROOT, "build", "assets")
+MANIFEST = "manifest.json"
+
+TEXT_TYPES = (".css", ".js", ".svg", ".json", ".txt", ".map")
+IMAGE_TYPES = (".png", ".jpg", ".jpeg")
+# Smaller than this, compression costs more than it saves on the wire
+MIN_COMPRESS_BYTES = 256
+
+
+def fingerprint(path, data):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _webp(data, quality):
+    with Image.open(io.BytesIO(data)) as image:
+        out = io.BytesIO()
+        image.save(out, "WEBP", quality=quality, method=6)
+        return out.getvalue()
+
+
+def build(source=SOURCE_DIR, output=BUILD_DIR, webp=False, quality=80):
+    """Build every asset under source into output; returns the manifest."""
+    if webp and Image is None:
+        print("Pillow is not installed; skipping WebP re-encoding")
+        webp = False
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+
+    manifest = {}
+    for dirpath, _, filenames in os.walk(source):
+        for filename in sorted(filenames):
+            full = os.path.join(dirpath, filename)
+            name = os.path.relpath(full, source).replace(os.sep, "/")
+            with open(full, "rb") as f:
+                data = f.read()
+
+            built = fingerprint(name, data)
+            _write(os.path.join(output, built), data)
+            entry = {"path": built, "size": len(data), "encodings": []}
+
+            ext = os.path.splitext(name)[1].lower()
+            if ext in TEXT_TYPES and len(data) >= MIN_COMPRESS_BYTES:
+                _write(os.path.join(output, built + ".gz"), gzip.compress(data, 9, mtime=0))
+                entry["encodings"].append("gzip")
+                if brotli is not None:
+                    _write(os.path.join(output, built + ".br"), brotli.compress(data, quality=11))
+                    entry["encodings"].append("br")
+            if webp and ext in IMAGE_TYPES:
+                encoded = _webp(data, quality)
+                if len(encoded) < len(data):
+                    entry["webp"] = fingerprint(os.path.splitext(name)[0] + ".webp", encoded)
+                    _write(os.path.join(output, entry["webp"]), encoded)
+            manifest[name] = entry
+
+    _write(os.path.join(output, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class AssetManifest:
+    """Run-time view of a build: asset URLs and precompressed variants."""
+
+    def __init__(self, directory=BUILD_DIR):
+        self.directory = directory
+        try:
+            with open(os.path.join(directory, MANIFEST)) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        # Image URLs then depend on the request's Accept header
+        self.negotiates_webp = any("webp" in entry for entry in self.entries.values())
+        # Built names are content-addressed; only those may be served
+        self.built = {}
+        for entry in self.entries.values():
+            self.built[entry["path"]] = entry
+            if "webp" in entry:
+                self.built[entry["webp"]] = {"path": entry["webp"], "encodings": []}
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def path(self, name, accept=""):
+        """Built path for a source asset, or None if it wasn't built."""
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        if "webp" in entry and "image/webp" in accept:
+            return entry["webp"]
+        return entry["path"]
+
+    def variant(self, built, accept_encoding=""):
+        """(file to send, Content-Encoding or None) for a built path; None if unknown."""
+        entry = self.built.get(built)
+        if entry is None:
+            return None
+        accepted = {e.split(";")[0].strip() for e in accept_encoding.split(",")}
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in entry["encodings"] and encoding in accepted:
+                return built + suffix, encoding
+        return built, None
+
+    @staticmethod
+    def mimetype(built):
+        return mimetypes.guess_type(built)[0] or "application/octet-stream"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--output", default=BUILD_DIR)
+    parser.add_argument("--webp", action="store_true", help="also emit WebP versions of images")
+    parser.add_argument("--quality", type=int, default=80, help="WebP quality (0-100)")
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.output, webp=args.webp, quality=args.quality)
+    raw = sum(e["size"] for e in manifest.values())
+    print(f"Built {len(manifest)} assets ({raw / 1024:.0f} KiB) into {args.output}")
+    for name, entry in sorted(manifest.items()):
+        extras = entry["encodings"] + (["webp"] if "webp" in entry else [])
+        print(f"  {name} -> {entry['path']}" + (f" (+{', '.join(extras)})" if extras else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Append-only, memory-mapped store of daily OHLCV bars.
+
+Each symbol has one file of fixed-size records (day, open, high, low, close,
+volume) in date order. New bars are appended with a plain write; reads map
+the file with np.memmap and slice it, so a range read is a view over the page
+cache rather than a copy. The sorted day column is the date index: a range
+lookup is two binary searches.
+"""
+import os
+import re
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within a process
+    fcntl = None
+
+BAR_DTYPE = np.dtype([
+    ("day", "<i4"),  # days since 1970-01-01
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+SYMBOL_RE = re.compile(r"^[A-Z0-9.\-]{1,16}$")
+_EPOCH = date(1970, 1, 1).toordinal()
+_MS_PER_DAY = 86_400_000
+
+
+def day_number(day):
+    return day.toordinal() - _EPOCH
+
+
+def day_from_number(number):
+    return date.fromordinal(int(number) + _EPOCH)
+
+
+def bars_from_aggregates(results):
+    """Polygon aggregate results ({t, o, h, l, c, v}) as a BAR_DTYPE array."""
+    bars = np.zeros(len(results), dtype=BAR_DTYPE)
+    for i, r in enumerate(results):
+        bars[i] = (r["t"] // _MS_PER_DAY, r["o"], r["h"], r["l"], r["c"], r.get("v", 0))
+    return bars
+
+
+class BarStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._maps = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+        self._append_lock = threading.Lock()
+
+    def path(self, symbol):
+        if not SYMBOL_RE.match(symbol):
+            raise ValueError(f"invalid symbol {symbol!r}")
+        return os.path.join(self.root, f"{symbol}.bars")
+
+    def bars(self, symbol):
+        """Every stored bar for symbol, as a read-only memory-mapped array."""
+        path = self.path(symbol)
+        try:
+            count = os.path.getsize(path) // BAR_DTYPE.itemsize
+        except FileNotFoundError:
+            count = 0
+        if count == 0:
+            return np.zeros(0, dtype=BAR_DTYPE)
+
+        with self._lock:
+            mapped = self._maps.get(symbol)
+        # The file only grows, so a map of the right length is still valid
+        if mapped is None or len(mapped) != count:
+            mapped = np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(count,))
+            with self._lock:
+                self._maps[symbol] = mapped
+        return mapped
+
+    def range(self, symbol, start=None, end=None):
+        """Bars with start <= day <= end (inclusive dates), as a view."""
+        bars = self.bars(symbol)
+        days = bars["day"]
+        lo = 0 if start is None else np.searchsorted(days, day_number(start), side="left")
+        hi = len(bars) if end is None else np.searchsorted(days, day_number(end), side="right")
+        return bars[lo:hi]
+
+    def close_on(self, symbol, day):
+        """The close on day, or on the last trading day before it; None if unknown."""
+        bars = self.bars(symbol)
+        i = np.searchsorted(bars["day"], day_number(day), side="right")
+        return float(bars["close"][i - 1]) if i else None
+
+    def last_day(self, symbol):
+        bars = self.bars(symbol)
+        return day_from_number(bars["day"][-1]) if len(bars) else None
+
+    def append(self, symbol, bars):
+        """Append the bars newer than the last stored day; returns how many were written."""
+        bars = np.sort(np.asarray(bars, dtype=BAR_DTYPE), order="day")
+        if not len(bars):
+            return 0
+        size = BAR_DTYPE.itemsize
+        with self._append_lock, open(self.path(symbol), "a+b") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                end = f.seek(0, os.SEEK_END)
+                if end % size:
+                    # A writer died mid-record; drop the torn tail
+                    end -= end % size
+                    f.truncate(end)
+                last = -1
+                if end:
+                    f.seek(end - size)
+                    last = np.frombuffer(f.read(size), dtype=BAR_DTYPE)["day"][0]
+
+                bars = bars[bars["day"] > last]
+                if len(bars):
+                    # Keep one bar per day if the input repeats a date
+                    keep = np.concatenate(([True], bars["day"][1:] != bars["day"][:-1]))
+                    bars = bars[keep]
+                    f.write(bars.tobytes())
+                    f.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return len(bars)
+
+    def backfill(self, symbol, fetch, start, end):
+        """Fetch and append the days between the last stored bar and end.
+
+        `fetch(symbol, start, end)` returns Polygon aggregate results. Only
+        days after the stored range are requested, and a symbol is asked
+        about a given end date at most once per process, so repeated calls
+        (weekends included) stay local. The file is append-only: days before
+        the first stored bar are never added.
+        """
+        with self._lock:
+            if self._checked.get(symbol, date.min) >= end:
+                return 0
+        last = self.last_day(symbol)
+        if last is not None:
+            start = max(start, last + timedelta(days=1))
+        written = 0
+        if start <= end:
+            written = self.append(symbol, bars_from_aggregates(fetch(symbol, start, end)))
+        with self._lock:
+            self._checked[symbol] = end
+        return written
+
+    def symbols(self):
+        return sorted(name[:-len(".bars")] for name in os.listdir(self.root)
+                      if name.endswith(".bars"))
@@ -0,0 +1,114 @@
+"""Portfolio analytics over a large ledger: vectorized vs a per-trade loop.
+
+    python -m benchmarks.analytics --trades 1000000
+
+Seeds one user with a random but valid trade history (never sells more than
+is held), then times the bulk load into NumPy, FIFO and average-cost basis,
+the full report, and a plain Python loop computing the same P&L.
+"""
+import argparse
+import random
+from collections import defaultdict, deque
+
+from sqlalchemy import text
+
+import analytics
+from benchmarks.common import (
+    add_output_args, load_app, print_table, read_results, summarize, timed, write_results,
+)
+from benchmarks.routes import seed_user, symbols
+
+
+def random_trades(count, names, seed=0):
+    rng = random.Random(seed)
+    held = defaultdict(int)
+    rows = []
+    for _ in range(count):
+        name = rng.choice(names)
+        price = round(rng.uniform(5, 500), 2)
+        if held[name] and rng.random() < 0.45:
+            qty = rng.randint(1, held[name])
+            held[name] -= qty
+            rows.append((name, "Sold", qty, price))
+        else:
+            qty = rng.randint(1, 100)
+            held[name] += qty
+            rows.append((name, analytics.BUY, qty, price))
+    return rows
+
+
+def python_loop(rows):
+    """Row-by-row FIFO and average-cost realized P&L, for comparison."""
+    lots = defaultdict(deque)
+    position = defaultdict(float)
+    avg = defaultdict(float)
+    fifo_pnl = avg_pnl = 0.0
+    for name, type_, qty, price in rows:
+        if type_ == analytics.BUY:
+            lots[name].append([qty, price])
+            avg[name] = (position[name] * avg[name] + qty * price) / (position[name] + qty)
+            position[name] += qty
+            continue
+        avg_pnl += qty * (price - avg[name])
+        position[name] -= qty
+        left = qty
+        while left:
+            lot = lots[name][0]
+            take = min(left, lot[0])
+            fifo_pnl += take * (price - lot[1])
+            lot[0] -= take
+            left -= take
+            if not lot[0]:
+                lots[name].popleft()
+    return fifo_pnl, avg_pnl
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=5)
+    add_output_args(parser, "analytics")
+    args = parser.parse_args()
+
+    main_module = load_app()
+    email = seed_user(main_module, "analytics@bench.test")
+    rows = random_trades(args.trades, symbols(args.symbols))
+    with main_module.app.app_context():
+        user_id = main_module.User.query.filter_by(email=email).one().id
+        with main_module.db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO transcation (type, name, qty, owner_id, price) "
+                              "VALUES (:type, :name, :qty, :owner_id, :price)"),
+                         [{"name": n, "type": t, "qty": q, "price": p, "owner_id": user_id}
+                          for n, t, q, p in rows])
+
+    results = []
+    with main_module.app.app_context():
+        trades = main_module.load_trades(user_id)
+        prices = {str(s): 100.0 for s in trades.symbols}
+        cases = {
+            "load_trades": lambda: main_module.load_trades(user_id),
+            "fifo": lambda: analytics.fifo(trades),
+            "average_cost": lambda: analytics.average_cost(trades),
+            "report": lambda: analytics.report(trades, prices, 0.0),
+            "python_loop": lambda: python_loop(rows),
+        }
+        for name, fn in cases.items():
+            samples, elapsed = timed(fn, args.iterations, warmup=1)
+            results.append(summarize(name, samples, elapsed, trades=args.trades))
+
+    print_table(results, read_results(args.compare) if args.compare else None)
+    fifo_pnl, avg_pnl = python_loop(rows)
+    print(f"realized P&L  fifo: {analytics.fifo(trades)[0].sum():.2f} (loop {fifo_pnl:.2f})"
+          f"  average: {analytics.average_cost(trades)[0].sum():.2f} (loop {avg_pnl:.2f})")
+    by_name = {r["name"]: r for r in results}
+    vectorized = by_name["fifo"]["p50_ms"] + by_name["average_cost"]["p50_ms"]
+    if vectorized:
+        print(f"vectorized FIFO + average cost: "
+              f"{by_name['python_loop']['p50_ms'] / vectorized:.0f}x faster than the loop")
+    write_results(args.output, "analytics", results)
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Shared helpers for the benchmark scripts.
+
+The app reads its configuration from the environment at import time, so
+load_app() points it at a throwaway database and an in-process Polygon stub
+before importing main.
+"""
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def serve_in_thread(app, port=0):
+    """Run a WSGI app on a background thread; returns (server, base_url)."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def load_app(db_path=None, stub_latency="fixed:0", env=None):
+    """Import main against a scratch SQLite file and a local Polygon stub."""
+    import polygon_stub
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="finance-bench-"), "bench.sqlite3")
+    _, stub_url = serve_in_thread(polygon_stub.create_app(latency=stub_latency, seed=0))
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["POLYGON_BASE_URL"] = stub_url
+    os.environ.setdefault("POLYGON_API_KEY", "stub")
+    os.environ.update(env or {})
+
+    import main
+
+    with main.app.app_context():
+        main.init_db()
+    return main
+
+
+def timed(fn, iterations, warmup=0):
+    """Call fn() iterations times; returns (per-call seconds, wall seconds)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return samples, time.perf_counter() - start
+
+
+def timed_concurrent(fn, iterations, concurrency):
+    """Split iterations across `concurrency` threads calling fn(worker_index)."""
+    samples = []
+    lock = threading.Lock()
+
+    def worker(index, count):
+        local = []
+        for _ in range(count):
+            t = time.perf_counter()
+            fn(index)
+            local.append(time.perf_counter() - t)
+        with lock:
+            samples.extend(local)
+
+    per_worker = [iterations // concurrency + (i < iterations % concurrency)
+                  for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_worker)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    k = (len(sorted_samples) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (k - lo)
+
+
+def summarize(name, samples, elapsed, **params):
+    ordered = sorted(samples)
+    return {
+        "name": name,
+        "params": params,
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+def result_key(result):
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def print_table(results, baseline=None):
+    baseline = {result_key(r): r for r in (baseline or [])}
+    print(f"{'benchmark':<44} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for r in results:
+        line = (f"{result_key(r):<44} {r['n']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+                f"{r['p99_ms']:>9.2f} {r['rps']:>9.1f}")
+        old = baseline.get(result_key(r))
+        if old and old["p50_ms"]:
+            line += f"   p50 {100 * (r['p50_ms'] / old['p50_ms'] - 1):+.1f}%"
+        print(line)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, suite, results):
+    doc = {
+        "suite": suite,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=2)
+
+
+def read_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def add_output_args(parser, suite):
+    parser.add_argument("--output", default=f"bench_{suite}.json",
+                        help="where to write machine-readable results")
+    parser.add_argument("--compare", metavar="RESULTS_JSON",
+                        help="print p50 deltas against a previous results file")
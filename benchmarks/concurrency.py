@@ -0,0 +1,110 @@
+"""Multi-process read/write contention benchmark for the SQLite configuration.
+
+    python -m benchmarks.concurrency --workers 4 --threads 4
+
+Spawns gunicorn-like worker processes that share one database file and mix
+/buy writes with /home and /history reads. Each journal mode is run against
+a fresh file, and the report includes errors ("database is locked" surfaces
+as a 500) next to the latency figures.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+
+from benchmarks.common import (
+    add_output_args, print_table, read_results, summarize, timed_concurrent, write_results,
+)
+
+CONFIGS = {
+    "rollback": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"},
+    "wal": {"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL"},
+}
+
+
+def worker(index, db_path, env, threads, iterations, write_ratio, barrier, queue):
+    from benchmarks.common import load_app
+    from benchmarks.routes import PASSWORD, TestClient, seed_user
+
+    main = load_app(db_path=db_path, env=env)
+    main.app.logger.disabled = True
+    email = seed_user(main, f"worker{index}@bench.test")
+    clients = [TestClient(main) for _ in range(threads)]
+    for client in clients:
+        client.post("/login", {"email": email, "password": PASSWORD})
+
+    rng = random.Random(index)
+    statuses = []
+
+    def call(i):
+        if rng.random() < write_ratio:
+            statuses.append(("write", clients[i].post("/buy", {"symbol": "AAPL", "shares": 1})))
+        else:
+            path = "/home" if rng.random() < 0.5 else "/history"
+            statuses.append(("read", clients[i].get(path)))
+
+    # Start every worker's request loop together so they actually contend
+    barrier.wait()
+    samples, elapsed = timed_concurrent(call, iterations, threads)
+    queue.put((samples, elapsed, statuses))
+
+
+def run_config(name, env, args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="finance-bench-"), "bench.sqlite3")
+    ctx = multiprocessing.get_context("spawn")
+
+    # Create the schema once so workers don't race on CREATE TABLE
+    init = ctx.Process(target=_init_db, args=(db_path, env))
+    init.start()
+    init.join()
+
+    queue = ctx.Queue()
+    barrier = ctx.Barrier(args.workers)
+    procs = [ctx.Process(target=worker, args=(i, db_path, env, args.threads, args.iterations,
+                                              args.write_ratio, barrier, queue))
+             for i in range(args.workers)]
+    for p in procs:
+        p.start()
+    parts = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    # Workers run their request loops concurrently; startup isn't counted
+    elapsed = max(part[1] for part in parts)
+
+    samples = [s for part in parts for s in part[0]]
+    statuses = [s for part in parts for s in part[2]]
+    result = summarize("mixed", samples, elapsed, config=name, workers=args.workers,
+                       threads=args.threads)
+    result["errors"] = sum(1 for _, status in statuses if status >= 500)
+    result["writes"] = sum(1 for kind, _ in statuses if kind == "write")
+    return result
+
+
+def _init_db(db_path, env):
+    from benchmarks.common import load_app
+
+    load_app(db_path=db_path, env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="processes sharing the DB")
+    parser.add_argument("--threads", type=int, default=4, help="request threads per worker")
+    parser.add_argument("--iterations", type=int, default=200, help="requests per worker")
+    parser.add_argument("--write-ratio", type=float, default=0.5)
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    add_output_args(parser, "concurrency")
+    args = parser.parse_args()
+
+    results = [run_config(name, CONFIGS[name], args) for name in args.configs.split(",")]
+    print_table(results, read_results(args.compare) if args.compare else None)
+    for r in results:
+        print(f"{r['params']['config']}: {r['errors']} errors out of {r['n']} requests "
+              f"({r['writes']} writes)")
+    write_results(args.output, "concurrency", results)
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
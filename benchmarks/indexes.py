@@ -0,0 +1,88 @@
+"""Lookup latency before and after migrations.apply_indexes().
+
+    python -m benchmarks.indexes --users 100000
+
+Seeds a scratch database without the indexes, times the queries behind
+login(), buy()/sell() and history(), then applies the indexes to the same
+file and times them again.
+"""
+import argparse
+import random
+
+from sqlalchemy import text
+
+from benchmarks.common import (
+    add_output_args, load_app, print_table, read_results, summarize, timed, write_results,
+)
+from benchmarks.routes import symbols
+from migrations import INDEXES, apply_indexes
+
+
+def seed(engine, users, holdings, trades):
+    names = symbols(max(holdings, 1))
+    with engine.begin() as conn:
+        for name, *_ in INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("INSERT INTO user (id, email, password, cash_in_hand) "
+                          "VALUES (:id, :email, 'x', 500)"),
+                     [{"id": i, "email": f"user{i}@bench.test"} for i in range(1, users + 1)])
+        conn.execute(text("INSERT INTO stock (name, qty, owner_id, price) "
+                          "VALUES (:name, 1, :owner_id, 100.0)"),
+                     [{"name": name, "owner_id": i}
+                      for i in range(1, users + 1) for name in names[:holdings]])
+        # Interleave owners the way real trading traffic would
+        conn.execute(text("INSERT INTO transcation (type, name, qty, owner_id) "
+                          "VALUES ('Bought', :name, 1, :owner_id)"),
+                     [{"name": names[n % len(names)], "owner_id": i}
+                      for n in range(trades) for i in range(1, users + 1)])
+    return names
+
+
+def run_queries(main, phase, users, names, iterations):
+    rng = random.Random(0)
+    User, Stock, Transcation = main.User, main.Stock, main.Transcation
+    queries = {
+        "user_by_email": lambda: User.query.filter_by(
+            email=f"user{rng.randint(1, users)}@bench.test").first(),
+        "stock_by_owner_name": lambda: Stock.query.filter_by(
+            owner_id=rng.randint(1, users), name=rng.choice(names)).first(),
+        "history_by_owner": lambda: Transcation.query.filter_by(
+            owner_id=rng.randint(1, users)).all(),
+    }
+    results = []
+    with main.app.app_context():
+        for name, query in queries.items():
+            samples, elapsed = timed(query, iterations, warmup=3)
+            results.append(summarize(name, samples, elapsed, phase=phase))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--holdings", type=int, default=2, help="stock rows per user")
+    parser.add_argument("--trades", type=int, default=5, help="transcation rows per user")
+    parser.add_argument("--iterations", type=int, default=50)
+    add_output_args(parser, "indexes")
+    args = parser.parse_args()
+
+    main_module = load_app()
+    with main_module.app.app_context():
+        engine = main_module.db.engine
+    names = seed(engine, args.users, args.holdings, args.trades)
+
+    results = run_queries(main_module, "before", args.users, names, args.iterations)
+    apply_indexes(engine)
+    results += run_queries(main_module, "after", args.users, names, args.iterations)
+
+    print_table(results, read_results(args.compare) if args.compare else None)
+    before = {r["name"]: r for r in results if r["params"]["phase"] == "before"}
+    for r in results:
+        if r["params"]["phase"] == "after" and r["p50_ms"]:
+            print(f"{r['name']}: {before[r['name']]['p50_ms'] / r['p50_ms']:.0f}x faster at p50")
+    write_results(args.output, "indexes", results)
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Order write throughput: one transaction per order vs group commit.
+
+    python -m benchmarks.orders --threads 1,8,32
+
+Runs bursts of buy orders from concurrent threads straight through
+execute_order and through the group-commit writer, on a database with
+synchronous=FULL so every commit pays for an fsync.
+"""
+import argparse
+
+from benchmarks.common import (
+    add_output_args, load_app, print_table, read_results, summarize, timed_concurrent,
+    write_results,
+)
+from benchmarks.routes import seed_user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", default="1,8,32", help="concurrent order submitters")
+    parser.add_argument("--iterations", type=int, default=500, help="orders per run")
+    parser.add_argument("--synchronous", default="FULL")
+    add_output_args(parser, "orders")
+    args = parser.parse_args()
+
+    main_module = load_app(env={"SQLITE_SYNCHRONOUS": args.synchronous})
+    app = main_module.app
+    results = []
+    for threads in [int(t) for t in args.threads.split(",")]:
+        with app.app_context():
+            user_ids = [main_module.User.query.filter_by(email=seed_user(
+                main_module, f"orders{threads}-{i}@bench.test")).one().id
+                for i in range(threads)]
+
+        for mode in ("direct", "group"):
+            app.config['ORDER_GROUP_COMMIT'] = mode == "group"
+
+            def order(index):
+                with app.app_context():
+                    main_module.submit_order(user_ids[index], "buy", "AAPL", 1, 1.0)
+
+            samples, elapsed = timed_concurrent(order, args.iterations, threads)
+            results.append(summarize("buy_order", samples, elapsed, mode=mode,
+                                     threads=threads))
+
+    print_table(results, read_results(args.compare) if args.compare else None)
+    print("group commit:", main_module.order_queue.stats())
+    write_results(args.output, "orders", results)
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
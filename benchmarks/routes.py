@@ -0,0 +1,177 @@
+"""Route-level latency/throughput benchmark for the Flask app.
+
+    python -m benchmarks.routes
+    python -m benchmarks.routes --mode server --concurrency 8 --compare bench_routes.json
+
+Drives login (Argon2 verify), register (Argon2 hash), buy, sell, home and
+history through the Flask test client or a real threaded HTTP server, against
+a scratch database and the local Polygon stub. Prints p50/p95/p99 and
+requests/second and writes them to --output as JSON.
+"""
+import argparse
+import itertools
+import string
+import threading
+from collections import Counter
+
+import requests
+from sqlalchemy import insert
+
+from benchmarks.common import (
+    add_output_args, load_app, print_table, read_results, serve_in_thread, summarize,
+    timed_concurrent, write_results,
+)
+
+PASSWORD = "bench-password"
+
+
+def symbols(n):
+    """n distinct, valid-looking ticker symbols: AA, AB, ..., ZZ, AAA, ..."""
+    out = []
+    for length in itertools.count(2):
+        for letters in itertools.product(string.ascii_uppercase, repeat=length):
+            out.append("".join(letters))
+            if len(out) == n:
+                return out
+
+
+def seed_user(main, email, holdings=0, history=0, qty=1_000_000, cash=10 ** 12):
+    """Create a user with `holdings` Stock rows and `history` Transcation rows."""
+    with main.app.app_context():
+        user = main.User(email=email, password=main.passwords.hasher.hash(PASSWORD), cash_in_hand=cash)
+        main.db.session.add(user)
+        main.db.session.flush()
+        names = symbols(max(holdings, 1))
+        if holdings:
+            main.db.session.execute(insert(main.Stock), [
+                {"name": name, "qty": qty, "owner_id": user.id, "price": 100.0}
+                for name in names
+            ])
+        if history:
+            main.db.session.execute(insert(main.Transcation), [
+                {"type": "Bought" if i % 2 else "Sold", "name": names[i % len(names)],
+                 "qty": 1, "owner_id": user.id}
+                for i in range(history)
+            ])
+        main.db.session.commit()
+    return email
+
+
+class TestClient:
+    def __init__(self, main):
+        self.client = main.app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def get(self, path):
+        return self.session.get(self.base_url + path, allow_redirects=False).status_code
+
+    def post(self, path, data):
+        return self.session.post(self.base_url + path, data=data,
+                                 allow_redirects=False).status_code
+
+
+def run_scenario(name, clients, request, iterations, **params):
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def call(index):
+        status = request(clients[index])
+        with lock:
+            statuses[status] += 1
+
+    samples, elapsed = timed_concurrent(call, iterations, len(clients))
+    result = summarize(name, samples, elapsed, concurrency=len(clients), **params)
+    result["statuses"] = {str(k): v for k, v in statuses.items()}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("client", "server"), default="client",
+                        help="Flask test client, or real HTTP against a threaded server")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--auth-iterations", type=int, default=20,
+                        help="iterations for the Argon2-bound login/register routes")
+    parser.add_argument("--portfolio-sizes", default="1,10,50")
+    parser.add_argument("--history-sizes", default="10,1000,10000")
+    parser.add_argument("--stub-latency", default="fixed:0",
+                        help="latency spec for the in-process Polygon stub")
+    add_output_args(parser, "routes")
+    args = parser.parse_args()
+
+    main_module = load_app(stub_latency=args.stub_latency)
+    if args.mode == "server":
+        _, base_url = serve_in_thread(main_module.app)
+
+        def new_client():
+            return HttpClient(base_url)
+    else:
+        def new_client():
+            return TestClient(main_module)
+
+    def logged_in_clients(email):
+        clients = [new_client() for _ in range(args.concurrency)]
+        for client in clients:
+            client.post("/login", {"email": email, "password": PASSWORD})
+        return clients
+
+    results = []
+    counter = itertools.count()
+
+    def next_email():
+        return f"user{next(counter)}@bench.test"
+
+    email = seed_user(main_module, next_email())
+    results.append(run_scenario(
+        "login", [new_client() for _ in range(args.concurrency)],
+        lambda c: c.post("/login", {"email": email, "password": PASSWORD}),
+        args.auth_iterations))
+
+    results.append(run_scenario(
+        "register", [new_client() for _ in range(args.concurrency)],
+        lambda c: c.post("/register/", {"email": next_email(), "password": PASSWORD}),
+        args.auth_iterations))
+
+    clients = logged_in_clients(seed_user(main_module, next_email()))
+    results.append(run_scenario(
+        "buy", clients, lambda c: c.post("/buy", {"symbol": "AAPL", "shares": 1}),
+        args.iterations))
+
+    clients = logged_in_clients(seed_user(main_module, next_email(), holdings=1))
+    sell_symbol = symbols(1)[0]
+    results.append(run_scenario(
+        "sell", clients, lambda c: c.post("/sell", {"symbol": sell_symbol, "shares": 1}),
+        args.iterations))
+
+    for size in [int(s) for s in args.portfolio_sizes.split(",")]:
+        clients = logged_in_clients(seed_user(main_module, next_email(), holdings=size))
+        results.append(run_scenario("home", clients, lambda c: c.get("/home"),
+                                    args.iterations, holdings=size))
+
+    for size in [int(s) for s in args.history_sizes.split(",")]:
+        clients = logged_in_clients(seed_user(main_module, next_email(), holdings=10,
+                                              history=size))
+        results.append(run_scenario("history", clients, lambda c: c.get("/history"),
+                                    args.iterations, rows=size))
+
+    for r in results:
+        r["params"]["mode"] = args.mode
+    print_table(results, read_results(args.compare) if args.compare else None)
+    write_results(args.output, "routes", results)
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
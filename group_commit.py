@@ -0,0 +1,95 @@
+"""Group commit: apply many queued writes in one transaction.
+
+Request threads submit validated write intents and wait on a Future. A single
+writer thread drains the queue, hands up to `max_batch` intents (collected
+for at most `max_wait` seconds) to `apply_batch` in one go, and resolves each
+Future with its own outcome. Commit cost is then paid per batch rather than
+per write.
+
+A caller that stops waiting can withdraw its intent with `future.cancel()`;
+that succeeds only while the intent is still queued, and the writer then
+skips it.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class GroupCommitQueue:
+    def __init__(self, apply_batch, max_batch=64, max_wait=0.002):
+        """`apply_batch(intents)` must return one result or exception per intent."""
+        self.apply_batch = apply_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._pid = None
+        self.batches = 0
+        self.writes = 0
+        self.cancelled = 0
+
+    def submit(self, intent):
+        self._ensure_writer()
+        future = Future()
+        self._queue.put((intent, future))
+        return future
+
+    def _ensure_writer(self):
+        # Started lazily, and again after a fork, since threads don't survive it
+        if self._writer is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer is None or self._pid != os.getpid():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._writer = threading.Thread(target=self._run, daemon=True,
+                                                name="group-commit-writer")
+                self._writer.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            taken = self._next_batch()
+            # Marks each Future running, so a late cancel() fails instead of racing the write
+            batch = [(intent, future) for intent, future in taken
+                     if future.set_running_or_notify_cancel()]
+            self.cancelled += len(taken) - len(batch)
+            if not batch:
+                continue
+            intents = [intent for intent, _ in batch]
+            try:
+                outcomes = self.apply_batch(intents)
+            except BaseException as e:
+                outcomes = [e] * len(batch)
+
+            self.batches += 1
+            self.writes += len(batch)
+            for (_, future), outcome in zip(batch, outcomes):
+                if isinstance(outcome, BaseException):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "cancelled": self.cancelled,
+            "avg_batch": self.writes / self.batches if self.batches else 0.0,
+        }
@@ -902,13 +902,44 @@
 
 
 
+import click
+import csv
+import hashlib
+import hmac
+import io
+import json
 import os
-import requests
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date, datetime, timedelta, timezone
+from functools import wraps
 from dotenv import load_dotenv
 load_dotenv()
-from flask import Flask, render_template, request, redirect, session, url_for
+from flask import (
+    Flask, Response, g, render_template, request, redirect, send_from_directory, session,
+    url_for, jsonify, stream_with_context,
+)
 from flask_sqlalchemy import SQLAlchemy
-from argon2 import PasswordHasher
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import selectinload
+import analytics
+from assets import BUILD_DIR as ASSETS_BUILD_DIR, AssetManifest
+from bars import BarStore, day_from_number
+from fragments import FragmentCache
+from group_commit import GroupCommitQueue
+from migrations import migration_lock, upgrade
+from passwords import PasswordService, PasswordServiceBusy
+from price_stream import PricePoller
+from sessions import CachedSessionStore, ServerSideSessionInterface, SQLiteSessionStore
+from sqlite_tuning import apply_pragmas, engine_options
+from symbols import BUNDLED_TICKERS, SymbolIndex, write_tickers
+from quotes import (
+    POLYGON_BASE_URL, CircuitBreaker, CircuitOpenError, QuoteCache, QuoteClient, QuoteFanout,
+    SingleFlight, TTLCache,
+)
 
 # Load API Key
 api_key = os.getenv("ALPHA_VANTAGE_KEY")
@@ -919,34 +950,245 @@ app = Flask(__name__)
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'db.sqlite3')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL", 'sqlite:///db.sqlite3')
+# SQLite tuning: WAL so readers don't block on writers, applied per connection
+app.config['SQLITE_JOURNAL_MODE'] = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+app.config['SQLITE_SYNCHRONOUS'] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+app.config['SQLITE_CACHE_SIZE_KB'] = int(os.getenv("SQLITE_CACHE_SIZE_KB", 20000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+app.config['DB_POOL_SIZE'] = int(os.getenv("DB_POOL_SIZE", 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.getenv("DB_MAX_OVERFLOW", 5))
+# Orders retry a few times if SQLite reports the database as busy
+app.config['ORDER_RETRIES'] = int(os.getenv("ORDER_RETRIES", 5))
+app.config['ORDER_RETRY_BACKOFF'] = float(os.getenv("ORDER_RETRY_BACKOFF", 0.05))
+# Optional group commit: one writer thread applies bursts of orders per transaction
+app.config['ORDER_GROUP_COMMIT'] = os.getenv("ORDER_GROUP_COMMIT", "0") == "1"
+app.config['ORDER_BATCH_MAX'] = int(os.getenv("ORDER_BATCH_MAX", 64))
+app.config['ORDER_BATCH_WAIT_MS'] = float(os.getenv("ORDER_BATCH_WAIT_MS", 2))
+app.config['ORDER_TIMEOUT'] = float(os.getenv("ORDER_TIMEOUT", 30))
+# Argon2 runs in a process pool; changing these rehashes passwords on next login
+app.config['ARGON2_TIME_COST'] = int(os.getenv("ARGON2_TIME_COST", 3))
+app.config['ARGON2_MEMORY_COST'] = int(os.getenv("ARGON2_MEMORY_COST", 65536))
+app.config['ARGON2_PARALLELISM'] = int(os.getenv("ARGON2_PARALLELISM", 4))
+app.config['PASSWORD_WORKERS'] = int(os.getenv("PASSWORD_WORKERS", 2))
+app.config['PASSWORD_QUEUE_LIMIT'] = int(os.getenv("PASSWORD_QUEUE_LIMIT", 32))
+app.config['PASSWORD_TIMEOUT'] = float(os.getenv("PASSWORD_TIMEOUT", 10))
+# Per-worker cache of each user's cash + holdings; buy/sell invalidate it. 0 disables
+app.config['HOLDINGS_CACHE_TTL'] = float(os.getenv("HOLDINGS_CACHE_TTL", 5))
+app.config['HOLDINGS_CACHE_MAX_USERS'] = int(os.getenv("HOLDINGS_CACHE_MAX_USERS", 4096))
+# Sessions: 'sqlite' (indexed table), 'memory' (LRU + write-behind to that table)
+# or 'cookie' (Flask's signed cookie)
+app.config['SESSION_BACKEND'] = os.getenv("SESSION_BACKEND", "sqlite")
+app.config['SESSION_DB_PATH'] = os.getenv("SESSION_DB_PATH",
+                                          os.path.join(app.instance_path, 'sessions.sqlite3'))
+app.config['SESSION_LIFETIME'] = int(os.getenv("SESSION_LIFETIME", 7 * 24 * 3600))
+app.config['SESSION_PURGE_INTERVAL'] = int(os.getenv("SESSION_PURGE_INTERVAL", 300))
+app.config['SESSION_CACHE_MAX_ENTRIES'] = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", 10000))
+app.config['SESSION_FLUSH_INTERVAL'] = float(os.getenv("SESSION_FLUSH_INTERVAL", 1))
+SQLITE_FILE_DB = (app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite:///')
+                  and ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI'])
+if SQLITE_FILE_DB:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW'],
+        busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'],
+    )
 # app.config['SECRET_KEY'] = 'the random string'
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "fallback-secret")
+# Bearer token for the */stats counters; unset, they are hidden
+app.config['STATS_TOKEN'] = os.getenv("STATS_TOKEN", "")
+# Quote cache: /prev only changes once a day, so keep prices in memory
+app.config['QUOTE_CACHE_MAX_ENTRIES'] = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", 1024))
+app.config['QUOTE_CACHE_TTL'] = int(os.getenv("QUOTE_CACHE_TTL", 300))
+# Polygon HTTP client: pooled keep-alive connections with retry/backoff.
+# Point POLYGON_BASE_URL at polygon_stub.py for offline load testing.
+app.config['POLYGON_BASE_URL'] = os.getenv("POLYGON_BASE_URL", POLYGON_BASE_URL)
+app.config['QUOTE_POOL_SIZE'] = int(os.getenv("QUOTE_POOL_SIZE", 10))
+app.config['QUOTE_RETRIES'] = int(os.getenv("QUOTE_RETRIES", 2))
+app.config['QUOTE_BACKOFF'] = float(os.getenv("QUOTE_BACKOFF", 0.3))
+app.config['QUOTE_CONNECT_TIMEOUT'] = float(os.getenv("QUOTE_CONNECT_TIMEOUT", 3.05))
+app.config['QUOTE_READ_TIMEOUT'] = float(os.getenv("QUOTE_READ_TIMEOUT", 10))
+# Parallel per-symbol fallback when the grouped endpoint misses symbols
+app.config['QUOTE_FANOUT_WORKERS'] = int(os.getenv("QUOTE_FANOUT_WORKERS", 8))
+app.config['QUOTE_FANOUT_DEADLINE'] = float(os.getenv("QUOTE_FANOUT_DEADLINE", 5))
+# Circuit breaker: fail fast during Polygon outages and serve stale prices
+app.config['QUOTE_BREAKER_FAILURES'] = int(os.getenv("QUOTE_BREAKER_FAILURES", 5))
+app.config['QUOTE_BREAKER_SLOW_CALL'] = float(os.getenv("QUOTE_BREAKER_SLOW_CALL", 3))
+app.config['QUOTE_BREAKER_RESET'] = float(os.getenv("QUOTE_BREAKER_RESET", 30))
+app.config['QUOTE_STALE_MAX_AGE'] = int(os.getenv("QUOTE_STALE_MAX_AGE", 86400))
+# History pages are fetched newest-first with a keyset cursor on Transcation.id
+app.config['HISTORY_PAGE_SIZE'] = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+app.config['HISTORY_MAX_PAGE_SIZE'] = int(os.getenv("HISTORY_MAX_PAGE_SIZE", 500))
+# Daily OHLCV bars kept on disk, one memory-mapped file per symbol
+app.config['BARS_DIR'] = os.getenv("BARS_DIR", os.path.join(app.instance_path, 'bars'))
+app.config['BARS_BACKFILL_DAYS'] = int(os.getenv("BARS_BACKFILL_DAYS", 365))
+# Ticker universe: written by `flask refresh-symbols`, else the bundled list
+app.config['SYMBOLS_FILE'] = os.getenv("SYMBOLS_FILE",
+                                      os.path.join(app.instance_path, 'tickers.csv'))
+# Only enforced once SYMBOLS_FILE exists; the bundled list is too small to reject against
+app.config['SYMBOLS_REQUIRE_KNOWN'] = os.getenv("SYMBOLS_REQUIRE_KNOWN", "1") == "1"
+# Output of `python assets.py`; without it templates fall back to plain /static URLs
+app.config['ASSETS_DIR'] = os.getenv("ASSETS_DIR", ASSETS_BUILD_DIR)
+app.config['ASSETS_MAX_AGE'] = int(os.getenv("ASSETS_MAX_AGE", 365 * 24 * 3600))
+# Rendered /home and /history pages, keyed by the user's latest trade; 0 disables
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+# /prices/stream: one upstream poll per interval per process, shared by every client.
+# Off by default: each open dashboard holds a request thread, which would pin
+# a default (single-threaded, sync) gunicorn worker
+app.config['PRICE_STREAM_ENABLED'] = os.getenv("PRICE_STREAM_ENABLED", "0") == "1"
+app.config['PRICE_STREAM_INTERVAL'] = float(os.getenv("PRICE_STREAM_INTERVAL", 15))
+app.config['PRICE_STREAM_HEARTBEAT'] = float(os.getenv("PRICE_STREAM_HEARTBEAT", 20))
+# Every open stream holds a worker thread; beyond this many per process, answer 503
+app.config['PRICE_STREAM_MAX_CLIENTS'] = int(os.getenv("PRICE_STREAM_MAX_CLIENTS", 16))
 
 db = SQLAlchemy(app)
-ph = PasswordHasher()
+if SQLITE_FILE_DB:
+    with app.app_context():
+        apply_pragmas(
+            db.engine,
+            journal_mode=app.config['SQLITE_JOURNAL_MODE'],
+            synchronous=app.config['SQLITE_SYNCHRONOUS'],
+            cache_size_kb=app.config['SQLITE_CACHE_SIZE_KB'],
+            mmap_size=app.config['SQLITE_MMAP_SIZE'],
+            busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'],
+        )
+passwords = PasswordService(
+    time_cost=app.config['ARGON2_TIME_COST'],
+    memory_cost=app.config['ARGON2_MEMORY_COST'],
+    parallelism=app.config['ARGON2_PARALLELISM'],
+    workers=app.config['PASSWORD_WORKERS'],
+    max_queue=app.config['PASSWORD_QUEUE_LIMIT'],
+    timeout=app.config['PASSWORD_TIMEOUT'],
+)
+holdings_cache = TTLCache(
+    max_entries=app.config['HOLDINGS_CACHE_MAX_USERS'],
+    ttl=app.config['HOLDINGS_CACHE_TTL'],
+)
+
+if app.config['SESSION_BACKEND'] in ('sqlite', 'memory'):
+    os.makedirs(os.path.dirname(app.config['SESSION_DB_PATH']), exist_ok=True)
+    session_store = SQLiteSessionStore(app.config['SESSION_DB_PATH'],
+                                       purge_interval=app.config['SESSION_PURGE_INTERVAL'])
+    if app.config['SESSION_BACKEND'] == 'memory':
+        session_store = CachedSessionStore(session_store,
+                                           max_entries=app.config['SESSION_CACHE_MAX_ENTRIES'],
+                                           flush_interval=app.config['SESSION_FLUSH_INTERVAL'])
+    app.session_interface = ServerSideSessionInterface(session_store,
+                                                       lifetime=app.config['SESSION_LIFETIME'])
+quote_cache = QuoteCache(
+    max_entries=app.config['QUOTE_CACHE_MAX_ENTRIES'],
+    ttl=app.config['QUOTE_CACHE_TTL'],
+)
+quote_client = QuoteClient(
+    api_key=os.getenv("POLYGON_API_KEY"),
+    base_url=app.config['POLYGON_BASE_URL'],
+    pool_size=app.config['QUOTE_POOL_SIZE'],
+    retries=app.config['QUOTE_RETRIES'],
+    backoff=app.config['QUOTE_BACKOFF'],
+    connect_timeout=app.config['QUOTE_CONNECT_TIMEOUT'],
+    read_timeout=app.config['QUOTE_READ_TIMEOUT'],
+)
+quote_fanout = QuoteFanout(
+    max_workers=app.config['QUOTE_FANOUT_WORKERS'],
+    deadline=app.config['QUOTE_FANOUT_DEADLINE'],
+)
+quote_flight = SingleFlight()
+quote_breaker = CircuitBreaker(
+    failure_threshold=app.config['QUOTE_BREAKER_FAILURES'],
+    slow_call_threshold=app.config['QUOTE_BREAKER_SLOW_CALL'],
+    reset_timeout=app.config['QUOTE_BREAKER_RESET'],
+)
+bar_store = BarStore(app.config['BARS_DIR'])
+asset_manifest = AssetManifest(app.config['ASSETS_DIR'])
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_MAX_BYTES'])
+# Late-bound: fetchQuotePrices is defined with the other quote helpers below
+price_poller = PricePoller(lambda symbols: fetchQuotePrices(symbols),
+                           interval=app.config['PRICE_STREAM_INTERVAL'],
+                           max_subscribers=app.config['PRICE_STREAM_MAX_CLIENTS'])
+# The poller's upstream failures must not trip the breaker that guards /quote and /buy
+stream_breaker = CircuitBreaker(
+    failure_threshold=app.config['QUOTE_BREAKER_FAILURES'],
+    slow_call_threshold=app.config['QUOTE_BREAKER_SLOW_CALL'],
+    reset_timeout=app.config['QUOTE_BREAKER_RESET'],
+)
+symbol_index = SymbolIndex.from_file(app.config['SYMBOLS_FILE']
+                                     if os.path.exists(app.config['SYMBOLS_FILE'])
+                                     else BUNDLED_TICKERS)
+
+@app.template_global()
+def asset_url(name):
+    """URL for a file under static/: its fingerprinted build if there is one."""
+    built = asset_manifest.path(name, request.headers.get('Accept', ''))
+    if built is None:
+        return url_for('static', filename=name)
+    return url_for('built_asset', filename=built)
+
+
+@app.after_request
+def vary_on_accept(response):
+    """Pages choose WebP image URLs by Accept, so shared caches must key on it too."""
+    if asset_manifest.negotiates_webp and response.mimetype == 'text/html':
+        response.vary.add('Accept')
+    return response
+
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    found = asset_manifest.variant(filename, request.headers.get('Accept-Encoding', ''))
+    if found is None:
+        return render_template('404.html', display_content='Page not found'), 404
+    path, encoding = found
+    response = send_from_directory(app.config['ASSETS_DIR'], path,
+                                   mimetype=AssetManifest.mimetype(filename))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    # The name changes with the content, so this URL never needs revalidating
+    response.headers['Cache-Control'] = (f"public, max-age={app.config['ASSETS_MAX_AGE']}, "
+                                         "immutable")
+    return response
 
 # ====================== DATABASE MODELS ======================
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_email', 'email', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(50))
     password = db.Column(db.String(100))
     cash_in_hand = db.Column(db.Integer, default=500)
     stock = db.relationship('Stock', backref='owner')
 
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class Stock(db.Model):
+    __table_args__ = (
+        db.Index('uq_stock_owner_name', 'owner_id', 'name', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50))
     qty = db.Column(db.Integer)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     price = db.Column(db.Float)
+    # Position bookkeeping, maintained by apply_order (average-cost method)
+    avg_cost = db.Column(db.Float)
+    realized_pnl = db.Column(db.Float, default=0.0)
 
 class Transcation(db.Model):
+    __table_args__ = (
+        db.Index('ix_transcation_owner_id_id', 'owner_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(50))
     name = db.Column(db.String(50))
     qty = db.Column(db.Integer)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # Ledger fields; NULL on trades recorded before they existed
+    price = db.Column(db.Float)
+    cash_delta = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=utcnow)
 
 # ====================== HELPER FUNCTION ======================
 # def getQuotePrice(symbol):
@@ -993,41 +1235,355 @@ class Transcation(db.Model):
 #     return float(price) if price else None
 
 
-def getQuotePrice(symbol):
-    api_key = os.getenv("POLYGON_API_KEY")
-    if not api_key:
-        print("Polygon API key not found")
-        return None
+def unknownSymbol(symbol):
+    """True if symbol is not in the refreshed ticker universe (checked before any API call).
+
+    The bundled list is a small sample for autocomplete, so symbols are only
+    rejected once `flask refresh-symbols` has written the full SYMBOLS_FILE.
+    """
+    return (app.config['SYMBOLS_REQUIRE_KNOWN']
+            and symbol_index.source == app.config['SYMBOLS_FILE']
+            and len(symbol_index) > 0 and symbol not in symbol_index)
 
-    url = f"https://api.polygon.io/v2/aggs/ticker/{symbol}/prev"
-    params = {
-        "apiKey": api_key
-    }
+
+def getQuote(symbol):
+    """Return (price, stale) for symbol; stale is True for a fallback price."""
+    cached = quote_cache.get(symbol)
+    if cached is not None:
+        return cached, False
+
+    if not quote_client.api_key:
+        print("Polygon API key not found")
+        return None, False
 
     try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+        # Concurrent requests for the same symbol share one upstream call
+        price = quote_flight.do(symbol, quote_breaker.call, quote_client.prev_close, symbol)
+        if price is not None:
+            quote_cache.set(symbol, price)
+        return price, False
+
+    except CircuitOpenError:
+        pass
+    except Exception as e:
+        print("Polygon exception:", e)
 
-        # Polygon error handling
-        if data.get("status") != "OK":
-            print("Polygon error:", data)
-            return None
+    # Upstream is down: fall back to the last known price, if recent enough
+    stale = quote_cache.get_stale(symbol, app.config['QUOTE_STALE_MAX_AGE'])
+    return stale, stale is not None
 
-        results = data.get("results")
-        if not results or len(results) == 0:
-            return None
 
-        # 'c' = close price
-        price = results[0].get("c")
-        return float(price) if price else None
+def getQuotePrice(symbol):
+    return getQuote(symbol)[0]
+
+
+def getQuotePrices(symbols):
+    """Price many symbols at once; returns {symbol: price or None}."""
+    prices = {}
+    missing = []
+    for symbol in dict.fromkeys(symbols):
+        cached = quote_cache.get(symbol)
+        if cached is not None:
+            prices[symbol] = cached
+        else:
+            missing.append(symbol)
+
+    if missing and quote_client.api_key:
+        try:
+            fetched = quote_breaker.call(quote_client.grouped_closes, missing)
+        except CircuitOpenError:
+            fetched = {}
+        except Exception as e:
+            print("Polygon exception:", e)
+            fetched = {}
+        for symbol, price in fetched.items():
+            quote_cache.set(symbol, price)
+            prices[symbol] = price
+
+    # Anything the grouped call didn't cover is fetched in parallel
+    leftover = [symbol for symbol in missing if symbol not in prices]
+    if leftover:
+        prices.update(quote_fanout.fetch(getQuotePrice, leftover))
+    return prices
+
+
+def fetchQuotePrices(symbols):
+    """Prices for the price stream poller; returns {symbol: price or None}.
+
+    Like getQuotePrices, only symbols whose cached quote has expired go
+    upstream, but through stream_breaker and without the stale fallback.
+    """
+    prices = {}
+    missing = []
+    for symbol in symbols:
+        cached = quote_cache.get(symbol)
+        if cached is not None:
+            prices[symbol] = cached
+        else:
+            missing.append(symbol)
+    if not missing or not quote_client.api_key:
+        return prices
 
+    try:
+        fetched = stream_breaker.call(quote_client.grouped_closes, missing)
+    except CircuitOpenError:
+        return prices
     except Exception as e:
         print("Polygon exception:", e)
-        return None
+        fetched = {}
+
+    leftover = [symbol for symbol in missing if symbol not in fetched]
+    if leftover:
+        fetched.update(quote_fanout.fetch(
+            lambda symbol: quote_flight.do(symbol, stream_breaker.call,
+                                           quote_client.prev_close, symbol),
+            leftover))
+    for symbol, price in fetched.items():
+        if price is not None:
+            quote_cache.set(symbol, price)
+            prices[symbol] = price
+    return prices
+
+
+def getBars(symbol, start=None, end=None):
+    """Daily bars for symbol between two dates, from the local store.
+
+    Whatever is missing up to yesterday is backfilled from Polygon first
+    (a year by default for a new symbol); after that reads never leave the
+    box. Returns a memory-mapped view, so slice before copying.
+    """
+    bar_store.path(symbol)  # ValueError for a malformed symbol, before any network call
+    yesterday = date.today() - timedelta(days=1)
+    end = min(end or yesterday, yesterday)
+    if quote_client.api_key:
+        first = end - timedelta(days=app.config['BARS_BACKFILL_DAYS'])
+        try:
+            # Only the network call goes through the breaker: a local read is no
+            # evidence Polygon is healthy
+            bar_store.backfill(symbol,
+                               lambda *args: quote_breaker.call(quote_client.daily_bars, *args),
+                               min(start or first, first), end)
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            print("Polygon exception:", e)
+    return bar_store.range(symbol, start, end)
 
 
+# ====================== CURRENT USER ======================
+Holding = namedtuple('Holding', 'name qty price avg_cost realized_pnl')
+Portfolio = namedtuple('Portfolio', 'cash holdings last_trade_id')
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if 'user' not in session:
+            return redirect(url_for('login'))
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def stats_required(view):
+    """Operational counters: 404 unless the request carries `Authorization: Bearer STATS_TOKEN`."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        token = app.config['STATS_TOKEN']
+        if not token or not hmac.compare_digest(request.headers.get('Authorization', ''),
+                                                f'Bearer {token}'):
+            return render_template('404.html', display_content='Page not found'), 404
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def current_user():
+    """The logged-in User with its Stock rows eager-loaded, once per request."""
+    if 'current_user' not in g:
+        g.current_user = db.session.execute(
+            db.select(User).options(selectinload(User.stock))
+            .where(User.id == session['user'])
+        ).scalar_one_or_none()
+    return g.current_user
+
+
+def latest_trade_id(user_id):
+    """Id of the user's newest transaction (0 if none); one seek on the (owner_id, id) index."""
+    return db.session.execute(
+        db.select(db.func.max(Transcation.id)).where(Transcation.owner_id == user_id)
+    ).scalar() or 0
+
+
+def current_portfolio():
+    """Cash and holdings for the logged-in user, from the per-worker cache if fresh."""
+    user_id = session['user']
+    portfolio = holdings_cache.get(user_id) if app.config['HOLDINGS_CACHE_TTL'] > 0 else None
+    if portfolio is None:
+        # Same read transaction as the holdings, so the id versions exactly this snapshot
+        last_trade_id = latest_trade_id(user_id)
+        user = current_user()
+        portfolio = Portfolio(
+            cash=user.cash_in_hand,
+            holdings=tuple(Holding(s.name, s.qty, s.price, s.avg_cost, s.realized_pnl or 0.0)
+                           for s in user.stock),
+            last_trade_id=last_trade_id,
+        )
+        holdings_cache.set(user_id, portfolio)
+    return portfolio
+
+
+# ====================== ORDER EXECUTION ======================
+class OrderRejected(Exception):
+    """The order failed validation (insufficient cash or shares)."""
+
+
+class OrderPending(Exception):
+    """The group-commit writer didn't confirm the order within ORDER_TIMEOUT."""
+
+
+def apply_order(conn, user_id, side, symbol, shares, price):
+    """Apply one trade on an open connection using conditional UPDATEs.
+
+    The balance and holding checks live in the WHERE clauses, so concurrent
+    orders for the same user can't overdraw cash or oversell shares, and the
+    first statement takes SQLite's write lock without a read-then-upgrade.
+    The position's average cost and realized P&L are updated in the same
+    transaction as the ledger row, so analytics never need to replay trades.
+    """
+    users, stocks = User.__table__, Stock.__table__
+    amount = price * shares
+
+    if side == 'buy':
+        result = conn.execute(
+            users.update()
+            .where(users.c.id == user_id, users.c.cash_in_hand >= amount)
+            .values(cash_in_hand=users.c.cash_in_hand - amount)
+        )
+        if result.rowcount == 0:
+            raise OrderRejected('Insufficient balance')
+        upsert = sqlite_insert(stocks).values(name=symbol, qty=shares, owner_id=user_id,
+                                              price=price, avg_cost=price, realized_pnl=0.0)
+        held_cost = stocks.c.qty * db.func.coalesce(stocks.c.avg_cost, stocks.c.price, 0)
+        conn.execute(upsert.on_conflict_do_update(
+            index_elements=['owner_id', 'name'],
+            set_={
+                'qty': stocks.c.qty + upsert.excluded.qty,
+                'price': upsert.excluded.price,
+                'avg_cost': (held_cost + upsert.excluded.qty * upsert.excluded.price)
+                            / (stocks.c.qty + upsert.excluded.qty),
+            },
+        ))
+        trade_type, cash_delta = 'Bought', -amount
+    else:
+        result = conn.execute(
+            stocks.update()
+            .where(stocks.c.owner_id == user_id, stocks.c.name == symbol,
+                   stocks.c.qty >= shares)
+            .values(
+                qty=stocks.c.qty - shares,
+                realized_pnl=db.func.coalesce(stocks.c.realized_pnl, 0)
+                + shares * (price - db.func.coalesce(stocks.c.avg_cost, price)),
+            )
+        )
+        if result.rowcount == 0:
+            raise OrderRejected('Insufficient shares to sell')
+        conn.execute(
+            users.update()
+            .where(users.c.id == user_id)
+            .values(cash_in_hand=users.c.cash_in_hand + amount)
+        )
+        trade_type, cash_delta = 'Sold', amount
+
+    conn.execute(Transcation.__table__.insert().values(
+        type=trade_type, name=symbol, qty=shares, owner_id=user_id,
+        price=price, cash_delta=cash_delta, created_at=utcnow()))
+
+
+def execute_order(user_id, side, symbol, shares, price):
+    """Run one order in its own short transaction, retrying while SQLite is busy."""
+    retries = app.config['ORDER_RETRIES']
+    for attempt in range(retries + 1):
+        try:
+            with db.engine.begin() as conn:
+                apply_order(conn, user_id, side, symbol, shares, price)
+            return
+        except OperationalError as e:
+            if 'locked' not in str(e) or attempt == retries:
+                raise
+            time.sleep(app.config['ORDER_RETRY_BACKOFF'] * 2 ** attempt)
+
+
+def apply_order_batch(orders):
+    """Apply a batch of (user_id, side, symbol, shares, price) in one transaction.
+
+    A rejected order fails its guarding UPDATE before writing anything, so it
+    can be reported on its own without rolling back the rest of the batch.
+    """
+    retries = app.config['ORDER_RETRIES']
+    with app.app_context():
+        for attempt in range(retries + 1):
+            outcomes = []
+            try:
+                with db.engine.begin() as conn:
+                    for order in orders:
+                        try:
+                            apply_order(conn, *order)
+                            outcomes.append(None)
+                        except OrderRejected as e:
+                            outcomes.append(e)
+                return outcomes
+            except OperationalError as e:
+                if 'locked' not in str(e) or attempt == retries:
+                    break
+                time.sleep(app.config['ORDER_RETRY_BACKOFF'] * 2 ** attempt)
+            except Exception:
+                break
+
+        # The batch couldn't commit; isolate the failure by running each alone
+        outcomes = []
+        for order in orders:
+            try:
+                execute_order(*order)
+                outcomes.append(None)
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+
+order_queue = GroupCommitQueue(
+    apply_order_batch,
+    max_batch=app.config['ORDER_BATCH_MAX'],
+    max_wait=app.config['ORDER_BATCH_WAIT_MS'] / 1000,
+)
+
+
+def submit_order(user_id, side, symbol, shares, price):
+    """Execute an order directly, or via the group-commit writer if enabled."""
+    try:
+        if not app.config['ORDER_GROUP_COMMIT']:
+            return execute_order(user_id, side, symbol, shares, price)
+        future = order_queue.submit((user_id, side, symbol, shares, price))
+        try:
+            return future.result(timeout=app.config['ORDER_TIMEOUT'])
+        except FutureTimeoutError:
+            # Withdraw it while still queued, so the user can retry without buying twice
+            if future.cancel():
+                raise OrderPending('Order timed out and was not placed, please try again')
+            raise OrderPending('Order still processing, check your history before retrying')
+    finally:
+        holdings_cache.delete(user_id)
+
 
 # ====================== AUTH ROUTES ======================
+def rotate_session():
+    """Issue a new session id when the user logs in or out (prevents session fixation).
+
+    Only server-side sessions have an id; signed cookie sessions are left alone.
+    """
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+
+
 @app.route('/', methods=['GET', 'POST'])
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -1042,38 +1598,95 @@ def login():
     user = User.query.filter_by(email=email).first()
     if user:
         try:
-            if ph.verify(user.password, password):
+            if passwords.verify(user.password, password):
+                # Argon2 parameters changed since this hash was made: upgrade it
+                if passwords.needs_rehash(user.password):
+                    user.password = passwords.hash(password)
+                    db.session.commit()
+                rotate_session()
                 session['user'] = user.id
                 return redirect(url_for('home'))
-        except:
-            pass
+        except PasswordServiceBusy:
+            return render_template('404.html', display_content='Server busy, please try again'), 503
     return render_template('incorrect_login.html')
 
 @app.route('/register/', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
-        hashedPassword = ph.hash(request.form['password'])
+        if User.query.filter_by(email=request.form['email']).first():
+            return render_template('404.html', display_content='Email already registered')
+        try:
+            hashedPassword = passwords.hash(request.form['password'])
+        except PasswordServiceBusy:
+            return render_template('404.html', display_content='Server busy, please try again'), 503
         new_user = User(email=request.form['email'], password=hashedPassword)
         db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent sign-up; the unique email index decided it
+            db.session.rollback()
+            return render_template('404.html', display_content='Email already registered')
         return redirect(url_for('login'))
     return render_template('register.html')
 
+@app.route('/auth/stats')
+@stats_required
+def auth_stats():
+    return jsonify(passwords.stats())
+
 @app.route('/logout', methods=['GET', 'POST'])
 def logout():
     session.pop('user', None)
+    rotate_session()
     return redirect(url_for('login'))
 
 # ====================== MAIN PAGES ======================
+def page_key(name, trade_id, *parts):
+    """Fragment cache key for one user's rendering of a page.
+
+    Every buy or sell inserts a transaction, so the user's latest trade id is
+    the version: a trade changes the key and the old page just ages out.
+    """
+    # asset_url() picks WebP images off the Accept header, so it shapes the page too
+    webp = 'image/webp' in request.headers.get('Accept', '')
+    return (name, session['user'], trade_id, webp) + parts
+
+
+def quote_stamps(symbols):
+    """When each symbol's cached quote was fetched, None for any that has expired."""
+    return tuple(quote_cache.stored_at(s) if quote_cache.get(s) is not None else None
+                 for s in symbols)
+
+
 @app.route('/home')
+@login_required
 def home():
-    if 'user' not in session:
-        return redirect(url_for('login'))
-
-    user_id = session['user']
-    user = User.query.get(user_id)
-    stock = Stock.query.filter_by(owner_id=user_id).all()
-    return render_template('home.html', stock=stock, user=user_id, cash=user.cash_in_hand)
+    # A hit costs one index seek: no holdings query, no quotes, no rendering
+    cached = fragment_cache.get(page_key('home', latest_trade_id(session['user'])))
+    if cached is not None:
+        html, symbols, stamps = cached
+        if None not in stamps and quote_stamps(symbols) == stamps:
+            return html
+
+    portfolio = current_portfolio()
+    stock = portfolio.holdings
+    symbols = tuple(s.name for s in stock)
+    prices = getQuotePrices(symbols)
+    stamps = quote_stamps(symbols)
+    total = portfolio.cash + sum(s.qty * (prices.get(s.name) or s.price) for s in stock)
+    html = render_template('home.html', stock=stock, cash=portfolio.cash,
+                           prices=prices, total=total)
+    # Keyed by the snapshot actually rendered, which may lag the seek above
+    fragment_cache.set(page_key('home', portfolio.last_trade_id), (html, symbols, stamps),
+                       size=sys.getsizeof(html))
+    return html
+
+
+@app.route('/pages/stats')
+@stats_required
+def page_stats():
+    return jsonify(fragments=fragment_cache.stats())
 
 @app.route('/show')
 def show():
@@ -1094,27 +1707,100 @@ def quote():
             return render_template('404.html', display_content='No symbol provided')
 
         symbol = symbol.upper().strip()
-        price = getQuotePrice(symbol)
+        if unknownSymbol(symbol):
+            return render_template('404.html', display_content='Unknown symbol')
+        price, stale = getQuote(symbol)
         if price is None:
             return render_template('404.html', display_content='Invalid symbol or API error')
 
-        return render_template('quote.html', quote=price, symbol=symbol)
+        return render_template('quote.html', quote=price, symbol=symbol, stale=stale)
 
     # GET request
     return render_template('quote.html')
 
+
+@app.route('/quote/<symbol>/bars')
+@login_required
+def quote_bars(symbol):
+    symbol = symbol.upper().strip()
+    # Each new symbol costs a year-long upstream fetch and a file, so only
+    # listed tickers and the user's own holdings are backfilled
+    if unknownSymbol(symbol) or (symbol not in symbol_index and symbol not in
+                                 {h.name for h in current_portfolio().holdings}):
+        return render_template('404.html', display_content='Unknown symbol'), 404
+    try:
+        start = date.fromisoformat(request.args['start']) if 'start' in request.args else None
+        end = date.fromisoformat(request.args['end']) if 'end' in request.args else None
+        bars = getBars(symbol, start, end)
+    except ValueError:
+        return render_template('404.html', display_content='Invalid symbol or date'), 400
+    return jsonify(
+        symbol=symbol,
+        date=[d.isoformat() for d in map(day_from_number, bars['day'])],
+        **{column: bars[column].tolist() for column in ('open', 'high', 'low', 'close', 'volume')},
+    )
+
+
+@app.route('/api/symbols')
+def api_symbols():
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    return jsonify(symbols=[{'symbol': symbol, 'name': name} for symbol, name
+                            in symbol_index.search(request.args.get('prefix', '').strip(), limit)])
+
+
+@app.route('/quote/stats')
+@stats_required
+def quote_stats():
+    return jsonify(cache=quote_cache.stats(), single_flight=quote_flight.stats(),
+                   breaker=quote_breaker.stats(),
+                   stream=dict(price_poller.stats(), breaker=stream_breaker.stats()))
+
+
+@app.route('/prices/stream')
+@login_required
+def price_stream():
+    """Server-sent events carrying {symbol: price} whenever a held symbol's price changes."""
+    if not app.config['PRICE_STREAM_ENABLED']:
+        return render_template('404.html', display_content='Page not found'), 404
+    symbols = [h.name for h in current_portfolio().holdings]
+    if not symbols:
+        # 204 tells EventSource not to reconnect
+        return Response(status=204)
+    subscription = price_poller.subscribe(symbols)
+    if subscription is None:
+        # Too many streams already hold this worker's threads; the page keeps its static prices
+        return Response(status=503, headers={'Retry-After': '60'})
+    heartbeat = app.config['PRICE_STREAM_HEARTBEAT']
+
+    def events():
+        try:
+            yield f"retry: {int(app.config['PRICE_STREAM_INTERVAL'] * 1000)}\n\n"
+            while True:
+                prices = subscription.next(timeout=heartbeat)
+                # A comment line keeps proxies from timing out an idle stream,
+                # and is where a closed connection surfaces as an error
+                yield f"data: {json.dumps(prices)}\n\n" if prices else ": keep-alive\n\n"
+        finally:
+            price_poller.unsubscribe(subscription)
+
+    response = Response(events(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also covers a client that disconnects before the body is ever iterated
+    response.call_on_close(lambda: price_poller.unsubscribe(subscription))
+    return response
+
 # ====================== BUY ======================
 @app.route('/buy', methods=['GET', 'POST'])
+@login_required
 def buy():
-    if 'user' not in session:
-        return redirect(url_for('login'))
-
     if request.method == 'POST':
         symbol = request.form.get('symbol', '').upper().strip()
         shares = request.form.get('shares')
 
         if not symbol:
             return render_template('404.html', display_content='No symbol provided')
+        if unknownSymbol(symbol):
+            return render_template('404.html', display_content='Unknown symbol')
 
         price = getQuotePrice(symbol)
         if price is None:
@@ -1124,26 +1810,15 @@ def buy():
             shares = int(shares)
         except:
             return render_template('404.html', display_content='Invalid number of shares')
+        if shares < 1:
+            return render_template('404.html', display_content='Invalid number of shares')
 
-        user_id = session['user']
-        u = User.query.get(user_id)
-        total_cost = price * shares
-
-        if u.cash_in_hand < total_cost:
-            return render_template('404.html', display_content='Insufficient balance')
-
-        u.cash_in_hand -= total_cost
-        s = Stock.query.filter_by(owner_id=user_id, name=symbol).first()
-        if s:
-            s.qty += shares
-            s.price = price
-        else:
-            new_stock = Stock(name=symbol, qty=shares, owner_id=user_id, price=price)
-            db.session.add(new_stock)
-
-        new_trans = Transcation(type='Bought', name=symbol, qty=shares, owner_id=user_id)
-        db.session.add(new_trans)
-        db.session.commit()
+        try:
+            submit_order(session['user'], 'buy', symbol, shares, price)
+        except OrderRejected as e:
+            return render_template('404.html', display_content=str(e))
+        except OrderPending as e:
+            return render_template('404.html', display_content=str(e)), 503
 
         return redirect(url_for('home'))
 
@@ -1151,16 +1826,17 @@ def buy():
 
 # ====================== SELL ======================
 @app.route('/sell', methods=['GET', 'POST'])
+@login_required
 def sell():
-    if 'user' not in session:
-        return redirect(url_for('login'))
-
     if request.method == 'POST':
         symbol = request.form.get('symbol', '').upper().strip()
         shares = request.form.get('shares')
 
         if not symbol:
             return render_template('404.html', display_content='No symbol provided')
+        # A delisted ticker drops out of the universe but can still be sold
+        if unknownSymbol(symbol) and all(h.name != symbol for h in current_portfolio().holdings):
+            return render_template('404.html', display_content='Unknown symbol')
 
         price = getQuotePrice(symbol)
         if price is None:
@@ -1170,20 +1846,15 @@ def sell():
             shares = int(shares)
         except:
             return render_template('404.html', display_content='Invalid number of shares')
+        if shares < 1:
+            return render_template('404.html', display_content='Invalid number of shares')
 
-        user_id = session['user']
-        u = User.query.get(user_id)
-        s = Stock.query.filter_by(owner_id=user_id, name=symbol).first()
-
-        if not s or s.qty < shares:
-            return render_template('404.html', display_content='Insufficient shares to sell')
-
-        s.qty -= shares
-        u.cash_in_hand += price * shares
-
-        new_trans = Transcation(type='Sold', name=symbol, qty=shares, owner_id=user_id)
-        db.session.add(new_trans)
-        db.session.commit()
+        try:
+            submit_order(session['user'], 'sell', symbol, shares, price)
+        except OrderRejected as e:
+            return render_template('404.html', display_content=str(e))
+        except OrderPending as e:
+            return render_template('404.html', display_content=str(e)), 503
 
         return redirect(url_for('home'))
 
@@ -1191,16 +1862,282 @@ def sell():
 
 # ====================== HISTORY ======================
 @app.route('/history')
+@login_required
 def history():
-    if 'user' not in session:
-        return redirect(url_for('login'))
-
     user_id = session['user']
-    transcation = Transcation.query.filter_by(owner_id=user_id).all()
-    return render_template('history.html', transcation=transcation, user=user_id)
+    try:
+        before = request.args.get('before', type=int)
+        limit = int(request.args.get('limit', app.config['HISTORY_PAGE_SIZE']))
+    except ValueError:
+        return render_template('404.html', display_content='Invalid page'), 400
+    limit = max(1, min(limit, app.config['HISTORY_MAX_PAGE_SIZE']))
+
+    if request.args.get('format') == 'json':
+        return history_json(*history_page(user_id, before, limit))
+
+    key = page_key('history', latest_trade_id(user_id), before, limit)
+    html = fragment_cache.get(key)
+    if html is None:
+        transcation, next_cursor = history_page(user_id, before, limit)
+        html = render_template('history.html', transcation=transcation, user=user_id,
+                               next_cursor=next_cursor, limit=limit)
+        fragment_cache.set(key, html)
+    return html
+
+
+EXPORT_TYPES = {'buy': 'Bought', 'bought': 'Bought', 'sell': 'Sold', 'sold': 'Sold'}
+EXPORT_COLUMNS = ('id', 'type', 'name', 'qty', 'price', 'cash_delta', 'created_at')
+
+
+@app.route('/history/export')
+@login_required
+def history_export():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return render_template('404.html', display_content='Unknown export format'), 400
+
+    query = (db.select(*(getattr(Transcation, c) for c in EXPORT_COLUMNS))
+             .where(Transcation.owner_id == session['user'])
+             .order_by(Transcation.id))
+    symbol = request.args.get('symbol', '').upper().strip()
+    if symbol:
+        query = query.where(Transcation.name == symbol)
+    trade_type = request.args.get('type', '').lower()
+    if trade_type:
+        if trade_type not in EXPORT_TYPES:
+            return render_template('404.html', display_content='Unknown trade type'), 400
+        query = query.where(Transcation.type == EXPORT_TYPES[trade_type])
+
+    if fmt == 'csv':
+        body, mimetype = export_csv(query), 'text/csv'
+    else:
+        body, mimetype = export_ndjson(query), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=history.{fmt}'},
+    )
+
+
+def export_rows(query, chunk=1000):
+    """Yield lists of rows, pulling `chunk` at a time from the DB cursor."""
+    result = db.session.execute(query.execution_options(yield_per=chunk))
+    for rows in result.partitions():
+        yield rows
+
+
+def export_csv(query):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buf.getvalue()
+    for rows in export_rows(query):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+
+def export_ndjson(query):
+    for rows in export_rows(query):
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + '\n'
+                      for row in rows)
+
+
+def history_json(transcation, next_cursor):
+    return jsonify(
+        transactions=[
+            {'id': t.id, 'type': t.type, 'name': t.name, 'qty': t.qty,
+             'price': t.price, 'cash_delta': t.cash_delta,
+             'created_at': t.created_at.isoformat() if t.created_at else None}
+            for t in transcation
+        ],
+        next=next_cursor,
+    )
+
+
+def history_page(user_id, before, limit):
+    """One keyset page of a user's transactions, newest first.
+
+    Seeks on the (owner_id, id) index, so every page costs the same however
+    long the history is. Returns (rows, cursor for the next page or None).
+    """
+    query = Transcation.query.filter(Transcation.owner_id == user_id)
+    if before is not None:
+        query = query.filter(Transcation.id < before)
+    rows = query.order_by(Transcation.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+# ====================== JSON API ======================
+def version_tag(*parts):
+    """A strong ETag value derived from whatever versions a response."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def conditional(tag, build, weak=False):
+    """304 if the client already holds `tag`, otherwise build() the response.
+
+    The tag is computed from versions (trade ids, prices) rather than from
+    the body, so a matching request skips building it. Versions must mean the
+    same in every worker, so nothing worker-local (like when this worker
+    cached a quote) goes into a tag.
+    """
+    # If-None-Match always uses the weak comparison (RFC 9110 13.1.2)
+    if request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(tag, weak=weak)
+    # Let clients keep the body but always revalidate it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def api_error(message, status):
+    return jsonify(error=message), status
+
+
+@app.route('/api/quote/<symbol>')
+def api_quote(symbol):
+    symbol = symbol.upper().strip()
+    if unknownSymbol(symbol):
+        return api_error('Unknown symbol', 404)
+    price, stale = getQuote(symbol)
+    if price is None:
+        return api_error('Quote unavailable', 503)
+    as_of = quote_cache.stored_at(symbol)
+    # Weak: as_of is when this worker fetched the price, so bodies for the same
+    # price differ slightly between workers
+    return conditional(
+        version_tag('quote', symbol, price, stale),
+        lambda: jsonify(symbol=symbol, price=price, stale=stale,
+                        as_of=datetime.fromtimestamp(as_of, timezone.utc).isoformat()
+                        if as_of else None),
+        weak=True,
+    )
+
+
+@app.route('/api/portfolio')
+@login_required
+def api_portfolio():
+    portfolio = current_portfolio()
+    prices = getQuotePrices([h.name for h in portfolio.holdings])
+    versions = [(h.name, prices.get(h.name)) for h in portfolio.holdings]
+
+    def build():
+        holdings = []
+        for h in portfolio.holdings:
+            price = prices.get(h.name) or h.price
+            holdings.append({'symbol': h.name, 'qty': h.qty, 'price': price,
+                             'value': h.qty * price, 'avg_cost': h.avg_cost,
+                             'realized_pnl': h.realized_pnl})
+        return jsonify(cash=portfolio.cash, holdings=holdings,
+                       total=portfolio.cash + sum(h['value'] for h in holdings),
+                       last_trade_id=portfolio.last_trade_id)
+
+    return conditional(version_tag('portfolio', session['user'], portfolio.last_trade_id,
+                                   portfolio.cash, versions), build)
+
+
+@app.route('/api/history')
+@login_required
+def api_history():
+    user_id = session['user']
+    try:
+        before = request.args.get('before', type=int)
+        limit = int(request.args.get('limit', app.config['HISTORY_PAGE_SIZE']))
+    except ValueError:
+        return api_error('Invalid page', 400)
+    limit = max(1, min(limit, app.config['HISTORY_MAX_PAGE_SIZE']))
+
+    # Trades are never edited, so the newest id versions every page
+    tag = version_tag('history', user_id, latest_trade_id(user_id), before, limit)
+    return conditional(tag, lambda: history_json(*history_page(user_id, before, limit)))
+
+# ====================== ANALYTICS ======================
+def load_trades(user_id, fallback_prices=None):
+    """A user's whole ledger as analytics.Trades, in one bulk query.
+
+    Goes through the raw DB-API cursor: building ORM rows for a million
+    trades would cost more than the analytics themselves.
+    """
+    raw = db.engine.raw_connection()
+    try:
+        rows = raw.cursor().execute(
+            "SELECT name, type, qty, price FROM transcation WHERE owner_id = ? ORDER BY id",
+            (user_id,),
+        ).fetchall()
+    finally:
+        raw.close()
+    return analytics.Trades.from_rows(rows, fallback_prices)
+
+
+@app.route('/analytics')
+@login_required
+def portfolio_analytics():
+    method = request.args.get('method', 'fifo')
+    if method not in analytics.METHODS:
+        return render_template('404.html', display_content='Unknown cost basis method'), 400
+
+    portfolio = current_portfolio()
+    # Trades from before prices were recorded are costed at the position's average
+    trades = load_trades(session['user'],
+                         {h.name: h.avg_cost or h.price for h in portfolio.holdings})
+    open_symbols = [s for s, q in zip(trades.symbols, trades.open_qty()) if q > 0]
+    prices = getQuotePrices([str(s) for s in open_symbols])
+    report = analytics.report(trades, prices, portfolio.cash, method)
+    if request.args.get('format') == 'json':
+        return jsonify(report)
+    return render_template('analytics.html', report=report, methods=analytics.METHODS)
 
 # ====================== MAIN ======================
-if __name__ == '__main__':
-    with app.app_context():
+def init_db():
+    # Workers booting together would otherwise race each other's CREATE and ALTER
+    # statements ("duplicate column", SQLITE_BUSY); the loser finds nothing left to do
+    with migration_lock(db.engine):
         db.create_all()
+        # Existing databases predate newer model columns and indexes; add them in place
+        upgrade(db.engine)
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables and bring columns and indexes up to date."""
+    init_db()
+    print("Database initialised")
+
+
+@app.cli.command('refresh-symbols')
+def refresh_symbols_command():
+    """Download the active US ticker list from Polygon into SYMBOLS_FILE."""
+    path = app.config['SYMBOLS_FILE']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    write_tickers(path, quote_client.tickers())
+    symbol_index.load(path)
+    print(f"Wrote {len(symbol_index)} symbols to {path}; restart workers to pick them up")
+
+
+@app.cli.command('backfill-bars')
+@click.argument('symbols', nargs=-1)
+@click.option('--days', default=None, type=int, help='History to fetch for new symbols.')
+def backfill_bars_command(symbols, days):
+    """Fetch daily bars for SYMBOLS (default: every held symbol) into the local store."""
+    symbols = [s.upper() for s in symbols] or sorted(
+        db.session.execute(db.select(Stock.name).distinct()).scalars())
+    if days is not None:
+        app.config['BARS_BACKFILL_DAYS'] = days
+    for symbol in symbols:
+        bars = getBars(symbol)
+        print(f"{symbol}: {len(bars)} bars"
+              + (f" through {day_from_number(bars['day'][-1])}" if len(bars) else ""))
+
+
+# Orders upsert on the (owner_id, name) index, so every worker (including
+# gunicorn ones, which never run __main__) makes sure the schema is current
+with app.app_context():
+    init_db()
+
+if __name__ == '__main__':
     app.run()
@@ -0,0 +1,144 @@
+"""Idempotent schema upgrades for existing SQLite databases.
+
+db.create_all() only creates missing tables, so columns and indexes added to
+the models later never reach an existing instance/db.sqlite3. upgrade()
+adds them in place: apply_columns() issues ALTER TABLE ... ADD COLUMN plus a
+one-off backfill, and apply_indexes() creates indexes after repairing any
+duplicate rows that would make a unique index fail.
+
+Every worker runs the upgrade at import, so several can start it at once;
+migration_lock() serializes them, and each re-reads the schema under it.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+try:
+    import fcntl
+except ImportError:  # Windows: upgrades are only serialized within a process
+    fcntl = None
+
+# (table, column, type, backfill SQL or None) - keep in sync with the models
+COLUMNS = (
+    ("transcation", "price", "FLOAT", None),
+    ("transcation", "cash_delta", "FLOAT", None),
+    ("transcation", "created_at", "DATETIME", None),
+    # Positions opened before cost tracking: best estimate is the last buy price
+    ("stock", "avg_cost", "FLOAT", "UPDATE stock SET avg_cost = price"),
+    ("stock", "realized_pnl", "FLOAT", "UPDATE stock SET realized_pnl = 0"),
+)
+
+# (name, table, columns, unique) - keep in sync with the models' __table_args__
+INDEXES = (
+    ("ix_user_email", "user", ("email",), True),
+    ("uq_stock_owner_name", "stock", ("owner_id", "name"), True),
+    ("ix_transcation_owner_id_id", "transcation", ("owner_id", "id"), False),
+)
+
+
+@contextmanager
+def migration_lock(engine):
+    """Hold an exclusive lock, shared by every process, for a file-backed database.
+
+    Not re-entrant: flock on a second open of the lock file would wait on itself.
+    """
+    path = engine.url.database
+    if fcntl is None or not path or path == ":memory:":
+        yield
+        return
+    with open(f"{path}.migrate.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _merge_duplicate_stock(conn):
+    """Fold duplicate (owner_id, name) holdings into the oldest row."""
+    dupes = conn.execute(text(
+        "SELECT owner_id, name, MIN(id), SUM(qty) FROM stock "
+        "GROUP BY owner_id, name HAVING COUNT(*) > 1"
+    )).all()
+    for owner_id, name, keep_id, qty in dupes:
+        conn.execute(text("UPDATE stock SET qty = :qty WHERE id = :id"),
+                     {"qty": qty, "id": keep_id})
+        conn.execute(text("DELETE FROM stock WHERE owner_id = :owner_id AND name = :name "
+                          "AND id != :id"),
+                     {"owner_id": owner_id, "name": name, "id": keep_id})
+    return len(dupes)
+
+
+def _rename_duplicate_emails(conn):
+    """Give every account but the oldest for an email a unique placeholder email.
+
+    Two accounts can't be merged safely, and login already picked the oldest,
+    so the others were unreachable anyway. Returns the renamed (id, email) pairs.
+    """
+    rows = conn.execute(text(
+        "SELECT id, email FROM user WHERE email IN (SELECT email FROM user "
+        "WHERE email IS NOT NULL GROUP BY email HAVING COUNT(*) > 1) ORDER BY email, id"
+    )).all()
+    renamed = []
+    seen = set()
+    for user_id, email in rows:
+        if email not in seen:
+            seen.add(email)
+            continue
+        conn.execute(text("UPDATE user SET email = :email WHERE id = :id"),
+                     {"email": f"{email}#duplicate-{user_id}", "id": user_id})
+        renamed.append((user_id, email))
+    return renamed
+
+
+def apply_columns(engine):
+    """Add any missing model columns to existing tables."""
+    with engine.begin() as conn:
+        for table, column, type_, backfill in COLUMNS:
+            existing = {row[1] for row in conn.execute(text(f'PRAGMA table_info("{table}")'))}
+            if column in existing:
+                continue
+            conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {type_}'))
+            if backfill:
+                conn.execute(text(backfill))
+
+
+def apply_indexes(engine):
+    """Create any missing indexes; safe to run on every startup.
+
+    An index that should be unique but was created without it (by an older
+    version of this function) is dropped and rebuilt as UNIQUE.
+    """
+    with engine.begin() as conn:
+        existing = {}
+        for table in {table for _, table, _, _ in INDEXES}:
+            for row in conn.execute(text(f'PRAGMA index_list("{table}")')):
+                existing[row[1]] = bool(row[2])
+        for name, table, columns, unique in INDEXES:
+            if name in existing:
+                if existing[name] or not unique:
+                    continue
+                conn.execute(text(f"DROP INDEX {name}"))
+
+            if table == "stock" and unique:
+                merged = _merge_duplicate_stock(conn)
+                if merged:
+                    print(f"Merged {merged} duplicate stock holdings before indexing")
+            if table == "user" and unique:
+                for user_id, email in _rename_duplicate_emails(conn):
+                    print(f"WARNING: user {user_id} shared the email {email!r} with an older "
+                          f"account; renamed to '{email}#duplicate-{user_id}'")
+
+            conn.execute(text(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} "
+                f"ON \"{table}\" ({', '.join(columns)})"
+            ))
+
+
+def upgrade(engine):
+    """Bring an existing database up to the current models.
+
+    Run it under migration_lock() when other processes may be doing the same.
+    """
+    apply_columns(engine)
+    apply_indexes(engine)
@@ -0,0 +1,132 @@
+"""Argon2 hashing and verification off the request thread.
+
+Argon2 is deliberately CPU- and memory-hard, so running it inline lets a
+burst of logins starve every other route in the worker. PasswordService runs
+hash/verify in a small process pool, refuses new work once `max_queue`
+operations are outstanding, and records queue depth and latency.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+_hasher = None
+_hasher_params = None
+
+
+class PasswordServiceBusy(Exception):
+    """Too many hash/verify operations are already queued."""
+
+
+def _get_hasher(params):
+    global _hasher, _hasher_params
+    if _hasher is None or _hasher_params != params:
+        _hasher = PasswordHasher(**params)
+        _hasher_params = params
+    return _hasher
+
+
+def _hash(params, password):
+    return _get_hasher(params).hash(password)
+
+
+def _verify(params, hashed, password):
+    try:
+        return _get_hasher(params).verify(hashed, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+class PasswordService:
+    def __init__(self, time_cost=3, memory_cost=65536, parallelism=4, workers=2,
+                 max_queue=32, timeout=10):
+        self.params = {
+            "time_cost": time_cost,
+            "memory_cost": memory_cost,
+            "parallelism": parallelism,
+        }
+        self.hasher = PasswordHasher(**self.params)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self.in_flight = 0
+        self.rejected = 0
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _executor(self):
+        # Created lazily, and again after a fork, since pools don't survive it
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordServiceBusy("password service is busy")
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            future = self._executor().submit(fn, self.params, *args)
+        except BaseException:
+            self._finished(start)
+            raise
+        # The slot is held until the work is done, not just until this caller
+        # stops waiting, so max_queue bounds the pool's real backlog
+        future.add_done_callback(lambda _: self._finished(start))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordServiceBusy("password service timed out")
+
+    def _finished(self, start):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.in_flight -= 1
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+        self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password)
+
+    def verify(self, hashed, password):
+        """True if password matches hashed; never raises on a mismatch."""
+        return self._run(_verify, hashed, password)
+
+    def needs_rehash(self, hashed):
+        """True if hashed was made with different Argon2 parameters."""
+        try:
+            return self.hasher.check_needs_rehash(hashed)
+        except InvalidHashError:
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "params": self.params,
+                "workers": self.workers,
+                "queue_depth": self.in_flight,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "calls": self.calls,
+                "avg_ms": 1000 * self.total_seconds / self.calls if self.calls else 0.0,
+                "max_ms": 1000 * self.max_seconds,
+            }
@@ -0,0 +1,172 @@
+"""Local stand-in for the parts of the Polygon API this app uses.
+
+Lets /quote, /buy, /sell and /home be load-tested offline without an API key:
+
+    python polygon_stub.py --port 8001 --latency lognormal:40:0.5 --error-rate 0.01
+    POLYGON_BASE_URL=http://127.0.0.1:8001 POLYGON_API_KEY=stub python main.py
+
+Prices are a deterministic function of (symbol, date), so runs are repeatable.
+"""
+import argparse
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from flask import Flask, jsonify, request
+
+DEFAULT_SYMBOLS = (
+    "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "NFLX", "IBM", "INTC",
+    "AMD", "ORCL", "CSCO", "ADBE", "CRM", "PYPL", "UBER", "SHOP", "SQ", "DIS",
+    "KO", "PEP", "WMT", "COST", "JPM", "BAC", "GS", "V", "MA", "XOM",
+)
+SYMBOL_RE = re.compile(r"^[A-Z][A-Z.]{0,5}$")
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a callable returning seconds to sleep.
+
+    fixed:MS | uniform:LO_MS:HI_MS | normal:MEAN_MS:SD_MS |
+    lognormal:MEDIAN_MS:SIGMA | exponential:MEAN_MS
+    """
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: args[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1])) / 1000
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(args[0]), args[1]) / 1000
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / args[0]) / 1000
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def bar(symbol, day):
+    """Deterministic daily OHLCV bar for symbol on day."""
+    seed = int(hashlib.sha1(symbol.encode()).hexdigest()[:8], 16)
+    base = 20 + seed % 480
+    phase = (seed % 628) / 100
+    n = day.toordinal()
+    noise = random.Random(f"{symbol}:{n}")
+    close = base * (1 + 0.25 * math.sin(n / 30 + phase)) * (1 + noise.uniform(-0.02, 0.02))
+    open_ = close * (1 + noise.uniform(-0.01, 0.01))
+    high = max(open_, close) * (1 + noise.uniform(0, 0.01))
+    low = min(open_, close) * (1 - noise.uniform(0, 0.01))
+    ts = int(datetime(day.year, day.month, day.day, 20, tzinfo=timezone.utc).timestamp() * 1000)
+    return {
+        "T": symbol,
+        "o": round(open_, 2),
+        "h": round(high, 2),
+        "l": round(low, 2),
+        "c": round(close, 2),
+        "v": noise.randint(100_000, 50_000_000),
+        "t": ts,
+    }
+
+
+def previous_session(day):
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def create_app(latency="fixed:0", error_rate=0.0, rate_limit_rate=0.0, seed=None,
+               symbols=DEFAULT_SYMBOLS):
+    app = Flask(__name__)
+    sample_latency = parse_latency(latency)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    @app.before_request
+    def inject_faults():
+        with rng_lock:
+            stats["requests"] += 1
+            delay = sample_latency(rng)
+            roll = rng.random()
+        time.sleep(delay)
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return jsonify(status="ERROR", error="You've exceeded the maximum requests per minute"), 429
+        if roll < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            return jsonify(status="ERROR", error="Internal server error"), 500
+
+    @app.route("/v2/aggs/ticker/<symbol>/prev")
+    def prev(symbol):
+        if not SYMBOL_RE.match(symbol):
+            return jsonify(ticker=symbol, status="OK", resultsCount=0, results=[])
+        result = bar(symbol, previous_session(date.today()))
+        return jsonify(ticker=symbol, status="OK", adjusted=True, resultsCount=1,
+                       results=[result])
+
+    @app.route("/v2/aggs/grouped/locale/us/market/stocks/<day>")
+    def grouped(day):
+        day = date.fromisoformat(day)
+        if day.weekday() >= 5 or day >= date.today():
+            return jsonify(status="OK", adjusted=True, resultsCount=0)
+        results = [bar(symbol, day) for symbol in symbols]
+        return jsonify(status="OK", adjusted=True, resultsCount=len(results), results=results)
+
+    @app.route("/v2/aggs/ticker/<symbol>/range/1/day/<start>/<end>")
+    def daily_range(symbol, start, end):
+        day, end = date.fromisoformat(start), date.fromisoformat(end)
+        results = []
+        while day <= end and day < date.today():
+            if day.weekday() < 5:
+                results.append({k: v for k, v in bar(symbol, day).items() if k != "T"})
+            day += timedelta(days=1)
+        return jsonify(ticker=symbol, status="OK", adjusted=True,
+                       resultsCount=len(results), results=results)
+
+    @app.route("/v3/reference/tickers")
+    def tickers():
+        limit = request.args.get("limit", 100, type=int)
+        offset = request.args.get("cursor", 0, type=int)
+        page = sorted(symbols)[offset:offset + limit]
+        body = {"status": "OK", "count": len(page),
+                "results": [{"ticker": s, "name": f"{s} Stub Inc.", "market": "stocks",
+                             "active": True} for s in page]}
+        if offset + limit < len(symbols):
+            body["next_url"] = f"{request.base_url}?cursor={offset + limit}&limit={limit}"
+        return jsonify(body)
+
+    @app.route("/stub/stats")
+    def stub_stats():
+        return jsonify(stats)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:MS, uniform:LO:HI, normal:MEAN:SD, "
+                             "lognormal:MEDIAN:SIGMA or exponential:MEAN (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fraction of requests answered with a 429")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for latency and fault injection")
+    parser.add_argument("--symbols", default=",".join(DEFAULT_SYMBOLS),
+                        help="comma separated tickers returned by grouped-daily")
+    args = parser.parse_args()
+
+    app = create_app(latency=args.latency, error_rate=args.error_rate,
+                     rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+                     symbols=tuple(args.symbols.split(",")))
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
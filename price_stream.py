@@ -0,0 +1,144 @@
+"""Shared upstream polling behind the live price stream.
+
+Each connected client subscribes to the symbols it holds. One poller thread
+per process fetches the union of subscribed symbols once per interval, in a
+single call to `fetch`, and hands every changed price to the subscribers of
+that symbol. Upstream cost therefore grows with the number of distinct
+symbols being watched, not with the number of viewers.
+"""
+import os
+import threading
+
+
+class Subscription:
+    """One client's view of the stream: the latest price per symbol not yet sent."""
+
+    def __init__(self, symbols):
+        self.symbols = frozenset(symbols)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def publish(self, prices):
+        # Updates for a slow client coalesce per symbol instead of queueing up
+        with self._lock:
+            self._pending.update(prices)
+            self._ready.set()
+
+    def next(self, timeout=None):
+        """Block for up to `timeout` seconds; returns {symbol: price}, empty on timeout."""
+        self._ready.wait(timeout)
+        with self._lock:
+            prices, self._pending = self._pending, {}
+            self._ready.clear()
+        return prices
+
+
+class PricePoller:
+    def __init__(self, fetch, interval=15, max_subscribers=None):
+        """`fetch(symbols)` must return {symbol: price or None} from upstream."""
+        self.fetch = fetch
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._watched = {}
+        self.latest = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._poller = None
+        self._pid = None
+        self.polls = 0
+        self.symbols_fetched = 0
+        self.published = 0
+        self.rejected = 0
+
+    def subscribe(self, symbols):
+        """A new Subscription, or None if `max_subscribers` are already connected."""
+        self._ensure_poller()
+        subscription = Subscription(symbols)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            new = False
+            for symbol in subscription.symbols:
+                new = new or symbol not in self._watched
+                self._watched[symbol] = self._watched.get(symbol, 0) + 1
+            self._subscribers.add(subscription)
+            known = {s: self.latest[s] for s in subscription.symbols if s in self.latest}
+        if known:
+            subscription.publish(known)
+        if new:
+            # Don't leave a new symbol unpriced until the next tick
+            self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription not in self._subscribers:
+                return
+            self._subscribers.discard(subscription)
+            for symbol in subscription.symbols:
+                self._watched[symbol] -= 1
+                if not self._watched[symbol]:
+                    del self._watched[symbol]
+                    self.latest.pop(symbol, None)
+
+    def _ensure_poller(self):
+        # Started lazily, and again after a fork, since threads don't survive it
+        if self._poller is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._poller is None or self._pid != os.getpid():
+                if self._pid != os.getpid():
+                    self._subscribers = set()
+                    self._watched = {}
+                    self.latest = {}
+                self._pid = os.getpid()
+                self._poller = threading.Thread(target=self._run, daemon=True,
+                                                name="price-poller")
+                self._poller.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                symbols = sorted(self._watched)
+            if symbols:
+                self.poll(symbols)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poll(self, symbols):
+        """Fetch symbols once and publish whatever changed to their subscribers."""
+        try:
+            prices = self.fetch(symbols)
+        except Exception as e:
+            print("Price poller exception:", e)
+            return
+        with self._lock:
+            self.polls += 1
+            self.symbols_fetched += len(symbols)
+            changed = {s: p for s, p in prices.items()
+                       if p is not None and s in self._watched and self.latest.get(s) != p}
+            self.latest.update(changed)
+            subscribers = list(self._subscribers)
+            self.published += len(changed)
+        if not changed:
+            return
+        for subscription in subscribers:
+            mine = {s: p for s, p in changed.items() if s in subscription.symbols}
+            if mine:
+                subscription.publish(mine)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "symbols": len(self._watched),
+                "interval": self.interval,
+                "polls": self.polls,
+                "symbols_fetched": self.symbols_fetched,
+                "published": self.published,
+                "max_subscribers": self.max_subscribers,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,390 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POLYGON_BASE_URL = "https://api.polygon.io"
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing/expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key, max_age):
+        """Return the last known value for key if it is at most max_age old.
+
+        Ignores the TTL, so an expired entry can still be served while
+        upstream is unavailable.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > max_age:
+                return None
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            # Monotonic time drives expiry; wall time is for callers (ETags, "as of")
+            self._entries[key] = (value, time.monotonic(), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stored_at(self, key):
+        """Wall-clock time key was last set, or None if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[2] if entry is not None else None
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def previous_weekday(day):
+    """The last weekday before day: the newest session grouped-daily can have."""
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+class QuoteCache(TTLCache):
+    """TTL + LRU cache of symbol -> price.
+
+    Polygon's /prev endpoint only changes once a day, so a short TTL in front
+    of it takes almost every repeated quote off the network.
+    """
+
+
+class QuoteClient:
+    """Polygon client that owns a pooled, keep-alive requests.Session.
+
+    One instance is shared by every route so TCP+TLS connections to Polygon
+    are reused instead of being re-established on each quote.
+    """
+
+    # Seconds an out-of-date grouped-daily result is trusted before asking again
+    GROUPED_RECHECK = 3600
+
+    def __init__(self, api_key, base_url=POLYGON_BASE_URL, pool_size=10,
+                 retries=2, backoff=0.3, connect_timeout=3.05, read_timeout=10):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers["Connection"] = "keep-alive"
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._grouped = None
+
+    def get(self, path, **params):
+        """GET a Polygon path and return the decoded JSON body."""
+        params["apiKey"] = self.api_key
+        response = self.session.get(self.base_url + path, params=params,
+                                    timeout=self.timeout)
+        # Rate limiting and server errors that survived retries are failures,
+        # not "symbol not found"
+        if response.status_code == 429 or response.status_code >= 500:
+            raise requests.HTTPError(f"Polygon returned {response.status_code}",
+                                     response=response)
+        return response.json()
+
+    def prev_close(self, symbol):
+        """Return the previous close for symbol, or None if Polygon has none."""
+        data = self.get(f"/v2/aggs/ticker/{symbol}/prev")
+
+        # Polygon error handling
+        if data.get("status") != "OK":
+            print("Polygon error:", data)
+            return None
+
+        results = data.get("results")
+        if not results:
+            return None
+
+        # 'c' = close price
+        price = results[0].get("c")
+        return float(price) if price else None
+
+    def grouped_closes(self, symbols, lookback=4):
+        """Return {symbol: close} for the most recent session, in one call.
+
+        Uses the grouped-daily aggregates endpoint, which returns every US
+        ticker for a date. Weekends and holidays come back empty, so walk back
+        up to `lookback` days until a trading session is found.
+
+        A session's closes never change, so the whole-market result is kept
+        and reused until the date rolls over. If the session found is older
+        than the previous weekday (a holiday, or yesterday not published yet),
+        it is only reused for `GROUPED_RECHECK` seconds.
+        """
+        today = date.today()
+        cached = self._grouped
+        if (cached is None or cached[0] != today
+                or (cached[1] != previous_weekday(today)
+                    and time.monotonic() - cached[3] > self.GROUPED_RECHECK)):
+            cached = self._fetch_grouped(today, lookback)
+            if cached is None:
+                return {}
+            self._grouped = cached
+        closes = cached[2]
+        return {symbol: closes[symbol] for symbol in set(symbols) if symbol in closes}
+
+    def _fetch_grouped(self, today, lookback):
+        """(today, session date, {symbol: close}, fetched at) for the latest session, or None."""
+        day = today
+        for _ in range(lookback):
+            day -= timedelta(days=1)
+            data = self.get(f"/v2/aggs/grouped/locale/us/market/stocks/{day.isoformat()}",
+                            adjusted="true")
+            if data.get("status") != "OK":
+                print("Polygon error:", data)
+                return None
+
+            results = data.get("results")
+            if results:
+                closes = {r["T"]: float(r["c"]) for r in results if r.get("T") and r.get("c")}
+                return today, day, closes, time.monotonic()
+        return None
+
+    def daily_bars(self, symbol, start, end):
+        """Return Polygon's daily aggregates for symbol between two dates, oldest first."""
+        path = f"/v2/aggs/ticker/{symbol}/range/1/day/{start.isoformat()}/{end.isoformat()}"
+        data = self.get(path, adjusted="true", sort="asc", limit=50000)
+        if data.get("status") not in ("OK", "DELAYED"):
+            print("Polygon error:", data)
+            return []
+        return data.get("results") or []
+
+    def tickers(self, market="stocks"):
+        """Yield (symbol, name) for every active ticker, following pagination."""
+        data = self.get("/v3/reference/tickers", market=market, active="true", limit=1000)
+        while True:
+            if data.get("status") != "OK":
+                raise requests.HTTPError(f"Polygon error: {data}")
+            for r in data.get("results") or []:
+                yield r["ticker"], r.get("name", "")
+            next_url = data.get("next_url")
+            if not next_url:
+                return
+            # next_url carries its own cursor but not the API key
+            response = self.session.get(next_url, params={"apiKey": self.api_key},
+                                        timeout=self.timeout)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.HTTPError(f"Polygon returned {response.status_code}",
+                                         response=response)
+            data = response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class QuoteFanout:
+    """Fetch many symbols in parallel on a shared, bounded thread pool.
+
+    The pool size is the process-wide cap on concurrent upstream calls. Each
+    batch gets a deadline; symbols still pending when it passes come back as
+    None so the caller can render partial results.
+    """
+
+    def __init__(self, max_workers=8, deadline=5.0):
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="quote-fanout")
+
+    def fetch(self, fetch_one, symbols, deadline=None):
+        futures = {symbol: self._executor.submit(fetch_one, symbol)
+                   for symbol in dict.fromkeys(symbols)}
+        done, _ = wait(futures.values(),
+                       timeout=self.deadline if deadline is None else deadline)
+
+        results = {}
+        for symbol, future in futures.items():
+            if future in done and future.exception() is None:
+                results[symbol] = future.result()
+            else:
+                future.cancel()
+                results[symbol] = None
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one upstream call.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is in flight wait for it and share its result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+            }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures or slow calls.
+
+    closed: calls go through; `failure_threshold` consecutive failures (an
+    exception, or a call slower than `slow_call_threshold` seconds) open it.
+    open: calls raise CircuitOpenError until `reset_timeout` has passed.
+    half_open: a single probe call is let through; success closes the
+    breaker, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, slow_call_threshold=3.0, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError("quote service unavailable")
+                self.state = self.HALF_OPEN
+            elif self.state == self.HALF_OPEN:
+                # Only one probe at a time
+                self.rejected += 1
+                raise CircuitOpenError("quote service unavailable")
+
+        start = time.monotonic()
+        try:
+            result = fn(*args)
+        except Exception:
+            self._record(ok=False)
+            raise
+        self._record(ok=time.monotonic() - start <= self.slow_call_threshold)
+        return result
+
+    def _record(self, ok):
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.state = self.CLOSED
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,262 @@
+"""Server-side session storage.
+
+Sessions live in an indexed SQLite table (one row per session, keyed by a
+random id held in the cookie), optionally fronted by an in-memory LRU that
+writes dirty sessions back in batches. A session is only written when it was
+modified, or when it is getting close to expiry, and expired rows are purged
+in bulk with a single indexed DELETE.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires=0.0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires = expires
+        self.modified = False
+        self.retired_sid = None
+
+    def regenerate(self):
+        """Move the data to a fresh sid; the old row is deleted when the session is saved.
+
+        Call on login and logout, so a sid that was known before the privilege
+        change (for example one planted by an attacker) is never authenticated.
+        """
+        if not self.new:
+            self.retired_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class SQLiteSessionStore:
+    def __init__(self, path, purge_interval=300):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        """Return (data, expires) for a live session, or None."""
+        row = self._conn().execute("SELECT data, expires FROM sessions WHERE sid = ?",
+                                   (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row
+
+    def expires(self, sid):
+        """Stored expiry for sid, or None if it has no row.
+
+        Every write moves the expiry, so it doubles as a version that caches
+        can check without reading the session data.
+        """
+        row = self._conn().execute("SELECT expires FROM sessions WHERE sid = ?",
+                                   (sid,)).fetchone()
+        return row[0] if row is not None else None
+
+    def put_many(self, items):
+        """Write [(sid, data, expires), ...] in one transaction."""
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO sessions (sid, data, expires) "
+                             "VALUES (?, ?, ?)", items)
+        self.maybe_purge()
+
+    def put(self, sid, data, expires):
+        self.put_many([(sid, data, expires)])
+
+    def delete(self, sid):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.purge_interval:
+            return 0
+        self._last_purge = now
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires < ?", (now,)).rowcount
+
+
+class CachedSessionStore:
+    """In-memory LRU in front of another store, with write-behind.
+
+    Writes land in memory and are flushed to the backing store by a
+    background thread every `flush_interval` seconds in one transaction.
+    Sessions written since the last flush can be lost if the process dies.
+
+    Each worker process has its own cache, so a cached session is checked
+    against the backing row's expiry before it is used: a session deleted or
+    rewritten by another worker is dropped or reloaded rather than served.
+    """
+
+    def __init__(self, backend, max_entries=10000, flush_interval=1.0):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._entries = OrderedDict()
+        self._dirty = {}
+        self._lock = threading.Lock()
+        # Held across a flush, so a delete can't be undone by a write in flight
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._pid = None
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                self._entries.move_to_end(sid)
+            dirty = sid in self._dirty
+        if entry is not None and not dirty:
+            stored = self.backend.expires(sid)
+            if stored is None:
+                # Logged out (or purged) by another worker
+                with self._lock:
+                    if sid not in self._dirty:
+                        self._entries.pop(sid, None)
+                return None
+            if stored != entry[1]:
+                entry = None
+        if entry is None:
+            entry = self.backend.get(sid)
+            if entry is None:
+                return None
+            self._remember(sid, entry)
+        if entry[1] < time.time():
+            return None
+        return entry
+
+    def _remember(self, sid, entry):
+        with self._lock:
+            self._entries[sid] = entry
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                old_sid, _ = self._entries.popitem(last=False)
+                # Don't drop an unflushed write
+                if old_sid in self._dirty:
+                    self._entries[old_sid] = self._dirty[old_sid]
+                    break
+
+    def put(self, sid, data, expires):
+        self._ensure_flusher()
+        self._remember(sid, (data, expires))
+        with self._lock:
+            self._dirty[sid] = (data, expires)
+
+    def delete(self, sid):
+        with self._flush_lock:
+            with self._lock:
+                self._entries.pop(sid, None)
+                self._dirty.pop(sid, None)
+            self.backend.delete(sid)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                dirty = dict(self._dirty)
+            if not dirty:
+                self.backend.maybe_purge()
+                return
+            self.backend.put_many([(sid, data, expires)
+                                   for sid, (data, expires) in dirty.items()])
+            # Entries stay dirty until written, so get() never reloads an older row;
+            # anything rewritten meanwhile stays dirty for the next flush
+            with self._lock:
+                for sid, entry in dirty.items():
+                    if self._dirty.get(sid) is entry:
+                        del self._dirty[sid]
+
+    def _ensure_flusher(self):
+        # Threads don't survive a fork, so start one per process
+        if self._flusher is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._flusher = threading.Thread(target=self._run, daemon=True,
+                                                 name="session-flusher")
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print("Session flush failed:", e)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, lifetime=7 * 24 * 3600):
+        self.store = store
+        self.lifetime = lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.store.get(sid)
+            if entry is not None:
+                data, expires = entry
+                return ServerSession(self.serializer.loads(data), sid=sid, expires=expires)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.retired_sid is not None:
+            self.store.delete(session.retired_sid)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+            if session.modified and (not session.new or session.retired_sid is not None):
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        # Unmodified sessions are only rewritten to push their expiry out
+        refresh = session.expires - now < self.lifetime / 2
+        if not (session.modified or session.new or refresh):
+            return
+
+        expires = now + self.lifetime
+        self.store.put(session.sid, self.serializer.dumps(dict(session)), expires)
+        response.set_cookie(
+            name, session.sid,
+            max_age=self.lifetime,
+            httponly=self.get_cookie_httponly(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+            domain=domain,
+            path=path,
+        )
@@ -0,0 +1,35 @@
+// Ticker suggestions for inputs marked data-autocomplete, from /api/symbols
+(function () {
+    document.querySelectorAll('input[data-autocomplete]').forEach(function (input, i) {
+        var list = document.createElement('datalist');
+        list.id = 'symbol-options-' + i;
+        input.setAttribute('list', list.id);
+        input.setAttribute('autocomplete', 'off');
+        input.parentNode.appendChild(list);
+
+        var timer = null;
+        var last = '';
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var prefix = input.value.trim();
+                if (!prefix || prefix === last) {
+                    return;
+                }
+                last = prefix;
+                fetch('/api/symbols?prefix=' + encodeURIComponent(prefix))
+                    .then(function (r) { return r.json(); })
+                    .then(function (data) {
+                        list.innerHTML = '';
+                        data.symbols.forEach(function (s) {
+                            var option = document.createElement('option');
+                            option.value = s.symbol;
+                            option.label = s.name;
+                            list.appendChild(option);
+                        });
+                    })
+                    .catch(function () {});
+            }, 120);
+        });
+    });
+})();
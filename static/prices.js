@@ -0,0 +1,27 @@
+// Live prices on the dashboard, pushed by /prices/stream
+(function () {
+    if (!window.EventSource) {
+        return;
+    }
+    var source = new EventSource('/prices/stream');
+    source.onmessage = function (event) {
+        var prices = JSON.parse(event.data);
+        var total = parseFloat(document.querySelector('[data-cash]').dataset.cash);
+        document.querySelectorAll('tr[data-symbol]').forEach(function (row) {
+            var qty = parseFloat(row.dataset.qty);
+            var price = prices[row.dataset.symbol];
+            if (price === undefined) {
+                price = parseFloat(row.querySelector('[data-field="price"]').textContent);
+            } else {
+                row.querySelector('[data-field="price"]').textContent = price;
+                row.querySelector('[data-field="value"]').textContent = qty * price;
+                if (row.dataset.avgCost !== '') {
+                    row.querySelector('[data-field="unrealized"]').textContent =
+                        (qty * (price - parseFloat(row.dataset.avgCost))).toFixed(2);
+                }
+            }
+            total += qty * price;
+        });
+        document.querySelector('[data-field="total"]').textContent = total;
+    };
+})();
@@ -0,0 +1,89 @@
+"""Local universe of ticker symbols with a prefix index.
+
+Symbols (and company names, lowercased) are kept in sorted lists, so a
+prefix lookup is two bisects plus a slice, and membership is a dict lookup.
+The universe is loaded from a CSV with `ticker` and `name` columns: the one
+bundled in data/ or a fresher copy written by `flask refresh-symbols`.
+"""
+import bisect
+import csv
+import os
+from collections import namedtuple
+
+BUNDLED_TICKERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tickers.csv")
+
+_Index = namedtuple("_Index", "names symbols by_name")
+
+
+class SymbolIndex:
+    def __init__(self, entries=()):
+        self.source = None
+        self.replace(entries)
+
+    @classmethod
+    def from_file(cls, path):
+        index = cls()
+        index.load(path)
+        return index
+
+    def load(self, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            self.replace((row["ticker"], row.get("name") or "") for row in csv.DictReader(f))
+        self.source = path
+
+    def replace(self, entries):
+        """Swap in a new universe of (symbol, name) pairs in one assignment."""
+        names = {}
+        for symbol, name in entries:
+            symbol = symbol.strip().upper()
+            if symbol:
+                names[symbol] = name.strip()
+        by_name = sorted((name.lower(), symbol) for symbol, name in names.items() if name)
+        # Readers grab self._index once, so they never see a half-built index
+        self._index = _Index(names, sorted(names), by_name)
+
+    def __contains__(self, symbol):
+        return symbol in self._index.names
+
+    def __len__(self):
+        return len(self._index.symbols)
+
+    def name(self, symbol):
+        return self._index.names.get(symbol)
+
+    def search(self, prefix, limit=10):
+        """Up to `limit` (symbol, name) pairs whose symbol, then name, starts with prefix."""
+        index = self._index
+        if not prefix:
+            return []
+        upper = prefix.upper()
+        lo = bisect.bisect_left(index.symbols, upper)
+        hi = bisect.bisect_left(index.symbols, upper + "\uffff", lo)
+        found = index.symbols[lo:min(hi, lo + limit)]
+
+        if len(found) < limit:
+            lower = prefix.lower()
+            lo = bisect.bisect_left(index.by_name, (lower,))
+            hi = bisect.bisect_left(index.by_name, (lower + "\uffff",), lo)
+            seen = set(found)
+            for _, symbol in index.by_name[lo:hi]:
+                if len(found) == limit:
+                    break
+                if symbol not in seen:
+                    found.append(symbol)
+                    seen.add(symbol)
+        return [(symbol, index.names[symbol]) for symbol in found]
+
+
+def write_tickers(path, entries):
+    """Write (symbol, name) pairs as a ticker CSV, atomically."""
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(("ticker", "name"))
+            writer.writerows(sorted(entries))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
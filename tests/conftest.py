@@ -0,0 +1,98 @@
+"""Fixtures for tests that import main: throwaway files and a fake Polygon.
+
+main reads its configuration and opens the database at import time, so it
+is imported once per run, after the environment points every file it
+touches into a temporary directory.
+"""
+import pytest
+
+
+class PolygonResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self):
+        return self.body
+
+
+class FakePolygon:
+    """Stands in for quote_client.session: prices by symbol, every path recorded."""
+
+    def __init__(self):
+        self.prices = {}
+        self.paths = []
+
+    def get(self, url, params=None, timeout=None):
+        path = "/" + url.split("://", 1)[-1].split("/", 1)[1]
+        self.paths.append(path)
+        if "/grouped/" in path:
+            return PolygonResponse({"status": "OK", "results": [
+                {"T": symbol, "c": price} for symbol, price in self.prices.items()]})
+        if path.endswith("/prev"):
+            price = self.prices.get(path.split("/")[-2])
+            return PolygonResponse({"status": "OK",
+                                    "results": [{"c": price}] if price is not None else []})
+        return PolygonResponse({"status": "OK", "results": []})
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    root = tmp_path_factory.mktemp("main")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("DATABASE_URL", f"sqlite:///{root / 'db.sqlite3'}")
+        mp.setenv("SESSION_DB_PATH", str(root / "sessions.sqlite3"))
+        mp.setenv("BARS_DIR", str(root / "bars"))
+        mp.setenv("SYMBOLS_FILE", str(root / "tickers.csv"))
+        mp.setenv("ASSETS_DIR", str(root / "assets"))
+        mp.setenv("POLYGON_API_KEY", "test")
+        mp.setenv("ARGON2_TIME_COST", "1")
+        mp.setenv("ARGON2_MEMORY_COST", "8")
+        mp.setenv("ARGON2_PARALLELISM", "1")
+        import main
+    return main
+
+
+@pytest.fixture
+def app(main, monkeypatch):
+    """main with empty tables, empty caches and Polygon replaced by a FakePolygon."""
+    with main.app.app_context():
+        main.db.drop_all()
+        main.init_db()
+    for cache in (main.holdings_cache, main.fragment_cache, main.quote_cache):
+        cache.clear()
+    monkeypatch.setattr(main, "polygon", FakePolygon(), raising=False)
+    monkeypatch.setattr(main.quote_client, "session", main.polygon)
+    monkeypatch.setattr(main.quote_client, "_grouped", None)
+    return main
+
+
+@pytest.fixture
+def trade(app):
+    """Returns a function placing an order straight through execute_order."""
+    def trade(user_id, side, symbol, shares, price=10.0):
+        with app.app.app_context():
+            app.execute_order(user_id, side, symbol, shares, price)
+    return trade
+
+
+@pytest.fixture
+def sign_up(app):
+    """Returns a function making test clients logged in as new users."""
+    def sign_up(email="trader@example.com", password="secret"):
+        client = app.app.test_client()
+        client.post("/register/", data={"email": email, "password": password})
+        client.post("/login", data={"email": email, "password": password})
+        with client.session_transaction() as session:
+            client.user_id = session["user"]
+        return client
+    return sign_up
+
+
+@pytest.fixture
+def client(sign_up):
+    """A test client logged in as a new user; its id is on client.user_id."""
+    return sign_up()
@@ -0,0 +1,127 @@
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from analytics import Trades, average_cost, fifo, report
+
+
+def ledger(seed, n=200, symbols=("AAA", "BBB", "CCC")):
+    """A random ledger that never sells more than it holds."""
+    rng = random.Random(seed)
+    held = dict.fromkeys(symbols, 0)
+    rows = []
+    for _ in range(n):
+        symbol = rng.choice(symbols)
+        price = round(rng.uniform(1, 100), 2)
+        if held[symbol] and rng.random() < 0.4:
+            qty = rng.randint(1, held[symbol])
+            held[symbol] -= qty
+            rows.append((symbol, "Sold", qty, price))
+        else:
+            qty = rng.randint(1, 20)
+            held[symbol] += qty
+            rows.append((symbol, "Bought", qty, price))
+    return rows
+
+
+def by_symbol(rows):
+    # Trades' own order: symbols by first appearance, ledger order within each
+    order = list(dict.fromkeys(name for name, *_ in rows))
+    return order, sorted(rows, key=lambda row: order.index(row[0]))
+
+
+def fifo_loop(rows):
+    order, rows = by_symbol(rows)
+    lots = {symbol: deque() for symbol in order}
+    realized = []
+    for name, type_, qty, price in rows:
+        if type_ == "Bought":
+            lots[name].append([qty, price])
+            realized.append(0.0)
+            continue
+        cost, left = 0.0, qty
+        while left and lots[name]:
+            lot = lots[name][0]
+            take = min(left, lot[0])
+            cost += take * lot[1]
+            lot[0] -= take
+            left -= take
+            if not lot[0]:
+                lots[name].popleft()
+        realized.append(qty * price - cost)
+    return realized, [sum(q * p for q, p in lots[s]) for s in order]
+
+
+def average_loop(rows):
+    order, rows = by_symbol(rows)
+    pos, avg = dict.fromkeys(order, 0.0), dict.fromkeys(order, 0.0)
+    realized = []
+    for name, type_, qty, price in rows:
+        if type_ == "Bought":
+            avg[name] = (pos[name] * avg[name] + qty * price) / (pos[name] + qty)
+            pos[name] += qty
+            realized.append(0.0)
+        else:
+            pos[name] -= qty
+            realized.append(qty * (price - avg[name]))
+    return realized, [pos[s] * avg[s] for s in order]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("method, loop", [(fifo, fifo_loop), (average_cost, average_loop)])
+def test_matches_a_per_trade_loop(seed, method, loop):
+    rows = ledger(seed)
+    realized, open_cost = method(Trades.from_rows(rows))
+    expected_realized, expected_open = loop(rows)
+    np.testing.assert_allclose(realized, expected_realized, atol=1e-6)
+    np.testing.assert_allclose(open_cost, expected_open, atol=1e-6)
+
+
+def test_symbol_opening_with_a_sell_does_not_inherit_the_previous_average():
+    trades = Trades.from_rows([("AAA", "Bought", 10, 5.0),
+                               ("BBB", "Sold", 2, 7.0),
+                               ("BBB", "Bought", 4, 3.0)])
+    realized, _ = average_cost(trades)
+    assert list(realized) == [0.0, 14.0, 0.0]
+
+
+def test_fifo_oversell_does_not_consume_another_symbols_lots():
+    trades = Trades.from_rows([("AAA", "Bought", 1, 10.0),
+                               ("AAA", "Sold", 3, 12.0),
+                               ("BBB", "Bought", 5, 2.0)])
+    realized, open_cost = fifo(trades)
+    assert list(realized) == [0.0, 26.0, 0.0]
+    assert list(open_cost) == [0.0, 10.0]
+
+
+def test_missing_prices_take_the_fallback():
+    trades = Trades.from_rows([("AAA", "Bought", 2, None), ("BBB", "Bought", 1, None)],
+                              fallback_prices={"AAA": 4.0})
+    assert list(trades.price) == [4.0, 0.0]
+
+
+def test_report():
+    trades = Trades.from_rows([("AAA", "Bought", 10, 5.0),
+                               ("AAA", "Sold", 4, 6.0),
+                               ("BBB", "Bought", 2, 10.0)])
+    result = report(trades, {"AAA": 7.0}, cash=100.0)
+    aaa, bbb = result["positions"]
+    assert (aaa["symbol"], aaa["qty"], aaa["cost_basis"], aaa["avg_cost"]) == ("AAA", 6, 30, 5)
+    assert (aaa["realized_pnl"], aaa["unrealized_pnl"]) == (4, 12)
+    # No current price: valued at the last trade price
+    assert (bbb["price"], bbb["value"], bbb["unrealized_pnl"]) == (10, 20, 0)
+    assert result["total_value"] == 162
+    assert result["invested"] == 70
+    assert result["return"] == pytest.approx(16 / 70)
+
+
+def test_report_rejects_unknown_methods():
+    with pytest.raises(ValueError):
+        report(Trades.from_rows([("AAA", "Bought", 1, 1.0)]), {}, 0, method="lifo")
+
+
+def test_empty_ledger():
+    trades = Trades([], [], [], [])
+    assert report(trades, {}, cash=50.0)["total_value"] == 50.0
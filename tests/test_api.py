@@ -0,0 +1,63 @@
+import pytest
+
+
+def revalidate(client, path, etag):
+    return client.get(path, headers={"If-None-Match": etag})
+
+
+def test_quote_etag_follows_the_price(app):
+    client = app.app.test_client()
+    app.polygon.prices["AAPL"] = 10.0
+    first = client.get("/api/quote/AAPL")
+    assert first.get_json()["price"] == 10.0
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    etag = first.headers["ETag"]
+    assert etag.startswith("W/")
+    assert revalidate(client, "/api/quote/AAPL", etag).status_code == 304
+
+    # Refetched at the same price (or by another worker): still current
+    app.quote_cache.clear()
+    assert revalidate(client, "/api/quote/AAPL", etag).status_code == 304
+
+    app.quote_cache.clear()
+    app.polygon.prices["AAPL"] = 11.0
+    changed = revalidate(client, "/api/quote/AAPL", etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_quote_errors(app):
+    client = app.app.test_client()
+    assert client.get("/api/quote/NOPE").status_code == 503
+
+
+@pytest.mark.parametrize("path", ["/api/portfolio", "/api/history"])
+def test_etag_changes_after_a_trade(app, client, path):
+    app.polygon.prices["AAPL"] = 10.0
+    client.post("/buy", data={"symbol": "AAPL", "shares": "1"})
+    etag = client.get(path).headers["ETag"]
+    assert revalidate(client, path, etag).status_code == 304
+
+    client.post("/buy", data={"symbol": "AAPL", "shares": "1"})
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert revalidate(client, path, response.headers["ETag"]).status_code == 304
+
+
+def test_portfolio_etag_changes_with_prices(app, client):
+    app.polygon.prices["AAPL"] = 10.0
+    client.post("/buy", data={"symbol": "AAPL", "shares": "1"})
+    etag = client.get("/api/portfolio").headers["ETag"]
+    app.quote_cache.clear()
+    app.quote_client._grouped = None
+    app.polygon.prices["AAPL"] = 12.0
+    response = revalidate(client, "/api/portfolio", etag)
+    assert response.status_code == 200
+    assert response.get_json()["total"] == 500 - 10 + 12
+
+
+def test_etags_are_per_user(app, client, sign_up):
+    etag = client.get("/api/history").headers["ETag"]
+    other = sign_up("other@example.com")
+    assert revalidate(other, "/api/history", etag).status_code == 200
@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import assets
+from assets import AssetManifest, build
+
+
+@pytest.fixture
+def static(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "brotli", None)
+    source = tmp_path / "static"
+    (source / "css").mkdir(parents=True)
+    (source / "css" / "site.css").write_text("body { color: black; }\n" * 50)
+    (source / "tiny.js").write_text("x=1")
+    (source / "favicon.ico").write_bytes(b"\0" * 1024)
+    return source
+
+
+def test_build_fingerprints_and_precompresses_large_text(static, tmp_path):
+    output = tmp_path / "build"
+    manifest = build(str(static), str(output))
+
+    css = manifest["css/site.css"]
+    assert css["path"].startswith("css/site.") and css["path"].endswith(".css")
+    assert css["encodings"] == ["gzip"]
+    with open(output / (css["path"] + ".gz"), "rb") as f:
+        assert gzip.decompress(f.read()) == (static / "css" / "site.css").read_bytes()
+
+    # Too small to be worth it, and .ico isn't text
+    assert manifest["tiny.js"]["encodings"] == []
+    assert manifest["favicon.ico"]["encodings"] == []
+    assert not os.path.exists(output / (manifest["favicon.ico"]["path"] + ".gz"))
+
+    with open(output / "manifest.json") as f:
+        assert json.load(f) == manifest
+
+
+def test_fingerprint_changes_with_content(static, tmp_path):
+    before = build(str(static), str(tmp_path / "a"))["tiny.js"]["path"]
+    (static / "tiny.js").write_text("x=2")
+    after = build(str(static), str(tmp_path / "b"))["tiny.js"]["path"]
+    assert before != after
+
+
+def test_manifest_serves_the_best_accepted_encoding(static, tmp_path):
+    build(str(static), str(tmp_path / "build"))
+    manifest = AssetManifest(str(tmp_path / "build"))
+    built = manifest.path("css/site.css")
+
+    assert manifest.variant(built, "gzip, deflate") == (built + ".gz", "gzip")
+    assert manifest.variant(built, "identity") == (built, None)
+    assert manifest.variant("css/site.css") is None
+    assert manifest.path("missing.css") is None
+    assert not manifest.negotiates_webp
+
+
+def test_manifest_picks_webp_only_when_accepted(tmp_path):
+    entries = {"logo.png": {"path": "logo.abc.png", "size": 10, "encodings": [],
+                            "webp": "logo.def.webp"}}
+    (tmp_path / "manifest.json").write_text(json.dumps(entries))
+    manifest = AssetManifest(str(tmp_path))
+
+    assert manifest.negotiates_webp
+    assert manifest.path("logo.png", "image/webp,*/*") == "logo.def.webp"
+    assert manifest.path("logo.png", "*/*") == "logo.abc.png"
+    assert manifest.variant("logo.def.webp") == ("logo.def.webp", None)
+
+
+def test_missing_build_is_falsy(tmp_path):
+    assert not AssetManifest(str(tmp_path / "nowhere"))
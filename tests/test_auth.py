@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import event
+
+
+@pytest.mark.parametrize("path", ["/home", "/buy", "/sell", "/history", "/history/export",
+                                  "/analytics", "/api/portfolio", "/api/history"])
+def test_pages_require_a_login(app, path):
+    response = app.app.test_client().get(path)
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/login")
+
+
+def test_logout_ends_access(client):
+    assert client.get("/home").status_code == 200
+    client.get("/logout")
+    assert client.get("/home").status_code == 302
+
+
+def holdings(client):
+    return {h["symbol"]: h["qty"] for h in client.get("/api/portfolio").get_json()["holdings"]}
+
+
+def test_holdings_are_cached_until_the_user_trades(app, client, trade):
+    app.polygon.prices.update(AAPL=10.0, MSFT=20.0)
+    assert holdings(client) == {}
+    # Written behind the routes' back: the cached snapshot still stands
+    trade(client.user_id, "buy", "MSFT", 1)
+    assert holdings(client) == {}
+
+    client.post("/buy", data={"symbol": "AAPL", "shares": "2"})
+    assert holdings(client) == {"AAPL": 2, "MSFT": 1}
+    client.post("/sell", data={"symbol": "AAPL", "shares": "1"})
+    assert holdings(client) == {"AAPL": 1, "MSFT": 1}
+
+
+def test_zero_ttl_disables_the_holdings_cache(app, client, trade, monkeypatch):
+    monkeypatch.setitem(app.app.config, "HOLDINGS_CACHE_TTL", 0)
+    app.polygon.prices["MSFT"] = 20.0
+    assert holdings(client) == {}
+    trade(client.user_id, "buy", "MSFT", 1)
+    assert holdings(client) == {"MSFT": 1}
+
+
+def test_user_and_holdings_load_in_one_pass(app, client, trade):
+    trade(client.user_id, "buy", "AAPL", 1)
+    trade(client.user_id, "buy", "MSFT", 1)
+    app.polygon.prices.update(AAPL=10.0, MSFT=20.0)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app.app_context():
+        engine = app.db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        client.get("/sell")  # a page that doesn't need the user
+        assert statements == []
+        client.get("/api/portfolio")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # The user row, then every holding in one eager-loading query
+    assert sum(s.lstrip().startswith("SELECT user.") for s in statements) == 1
+    assert sum("FROM stock" in s for s in statements) == 1
@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from bars import BAR_DTYPE, BarStore, day_number
+
+
+def bar_array(*days, close=1.0):
+    bars = np.zeros(len(days), dtype=BAR_DTYPE)
+    bars["day"] = [day_number(d) for d in days]
+    bars["close"] = close
+    return bars
+
+
+def aggregate(day, close):
+    ms = day_number(day) * 86_400_000
+    return {"t": ms, "o": close, "h": close, "l": close, "c": close, "v": 100}
+
+
+D = [date(2024, 3, 4) + timedelta(days=i) for i in range(5)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(str(tmp_path / "bars"))
+
+
+def test_append_keeps_only_newer_days_once_each(store):
+    assert store.append("AAPL", bar_array(D[1], D[0], D[1])) == 2
+    assert store.append("AAPL", bar_array(D[0], D[1], D[2])) == 1
+    assert list(store.bars("AAPL")["day"]) == [day_number(d) for d in D[:3]]
+    assert store.last_day("AAPL") == D[2]
+
+
+def test_appending_nothing_creates_no_file(store):
+    assert store.append("AAPL", bar_array()) == 0
+    assert store.symbols() == []
+
+
+def test_append_drops_a_torn_tail(store):
+    store.append("AAPL", bar_array(D[0]))
+    with open(store.path("AAPL"), "ab") as f:
+        f.write(b"\0" * 5)
+    store.append("AAPL", bar_array(D[1]))
+    assert len(store.bars("AAPL")) == 2
+
+
+def test_range_and_close_on(store):
+    store.append("AAPL", np.concatenate([bar_array(D[0], close=1.0),
+                                         bar_array(D[2], close=3.0)]))
+    assert len(store.range("AAPL", D[1], D[4])) == 1
+    assert len(store.range("AAPL")) == 2
+    assert store.close_on("AAPL", D[1]) == 1.0
+    assert store.close_on("AAPL", D[4]) == 3.0
+    assert store.close_on("AAPL", D[0] - timedelta(days=1)) is None
+    assert len(store.range("MSFT")) == 0
+
+
+def test_invalid_symbols_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.path("../etc")
+
+
+def test_backfill_fetches_only_past_the_stored_range_once_per_end(store):
+    calls = []
+
+    def fetch(symbol, start, end):
+        calls.append((start, end))
+        return [aggregate(day, 2.0) for day in D if start <= day <= end]
+
+    store.append("AAPL", bar_array(D[0], D[1]))
+    assert store.backfill("AAPL", fetch, D[0], D[3]) == 2
+    assert calls == [(D[2], D[3])]
+    assert store.backfill("AAPL", fetch, D[0], D[3]) == 0
+    assert len(calls) == 1
+    assert store.backfill("AAPL", fetch, D[0], D[4]) == 1
+    assert store.symbols() == ["AAPL"]
+
+
+def test_a_failed_fetch_is_retried(store):
+    def failing(symbol, start, end):
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        store.backfill("AAPL", failing, D[0], D[1])
+    assert store.backfill("AAPL", lambda *args: [aggregate(D[1], 1.0)], D[0], D[1]) == 1
+
+
+@pytest.fixture
+def bars_app(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "bar_store", BarStore(str(tmp_path / "routes")))
+    return app
+
+
+def range_calls(app):
+    return [p for p in app.polygon.paths if "/range/" in p]
+
+
+def test_bars_route_requires_a_login(bars_app):
+    response = bars_app.app.test_client().get("/quote/AAPL/bars")
+    assert response.status_code == 302
+    assert range_calls(bars_app) == []
+
+
+def test_bars_route_refuses_unlisted_symbols_before_going_upstream(bars_app, client):
+    assert client.get("/quote/ZZZZ1/bars").status_code == 404
+    assert range_calls(bars_app) == []
+    assert bars_app.bar_store.symbols() == []
+
+
+def test_bars_route_backfills_listed_and_held_symbols(bars_app, client, trade):
+    body = client.get("/quote/AAPL/bars").get_json()
+    assert body["symbol"] == "AAPL" and body["close"] == []
+    trade(client.user_id, "buy", "ZZZZ1", 1)
+    assert client.get("/quote/ZZZZ1/bars").status_code == 200
+    assert [p.split("/")[4] for p in range_calls(bars_app)] == ["AAPL", "ZZZZ1"]
+    # Polygon had nothing, so nothing was written
+    assert bars_app.bar_store.symbols() == []
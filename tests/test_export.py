@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture
+def trades(client, trade):
+    trade(client.user_id, "buy", "AAPL", 3, 10.0)
+    trade(client.user_id, "buy", "MSFT", 2, 20.0)
+    trade(client.user_id, "sell", "AAPL", 1, 15.0)
+    return client
+
+
+def export(client, **args):
+    response = client.get("/history/export", query_string=args)
+    assert response.status_code == 200
+    return response
+
+
+def test_csv_export(trades):
+    response = export(trades)
+    assert response.mimetype == "text/csv"
+    assert "attachment; filename=history.csv" in response.headers["Content-Disposition"]
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["id", "type", "name", "qty", "price", "cash_delta", "created_at"]
+    assert [row[1:6] for row in rows[1:]] == [
+        ["Bought", "AAPL", "3", "10.0", "-30.0"],
+        ["Bought", "MSFT", "2", "20.0", "-40.0"],
+        ["Sold", "AAPL", "1", "15.0", "15.0"],
+    ]
+
+
+def test_ndjson_export(trades):
+    response = export(trades, format="ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(r["type"], r["name"], r["qty"]) for r in rows] == [
+        ("Bought", "AAPL", 3), ("Bought", "MSFT", 2), ("Sold", "AAPL", 1)]
+    assert rows[0]["created_at"]
+
+
+def test_filters_by_symbol_and_type(trades):
+    rows = export(trades, format="ndjson", symbol="aapl").get_data(as_text=True).splitlines()
+    assert [json.loads(r)["type"] for r in rows] == ["Bought", "Sold"]
+    rows = export(trades, format="ndjson", type="sell").get_data(as_text=True).splitlines()
+    assert [json.loads(r)["name"] for r in rows] == ["AAPL"]
+    rows = export(trades, format="ndjson", symbol="MSFT", type="Sold").get_data(as_text=True)
+    assert rows == ""
+
+
+def test_only_the_users_own_trades_are_exported(trades, sign_up):
+    other = sign_up("other@example.com")
+    assert export(other, format="ndjson").get_data(as_text=True) == ""
+
+
+@pytest.mark.parametrize("args", [{"type": "short"}, {"format": "xml"}])
+def test_bad_arguments_are_rejected(trades, args):
+    assert trades.get("/history/export", query_string=args).status_code == 400
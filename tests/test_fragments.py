@@ -0,0 +1,54 @@
+from fragments import FragmentCache
+
+
+def test_hits_and_misses():
+    cache = FragmentCache()
+    assert cache.get(("home", 1, 0)) is None
+    cache.set(("home", 1, 0), "<html>")
+    assert cache.get(("home", 1, 0)) == "<html>"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = FragmentCache(max_bytes=100)
+    cache.set("a", "A", size=40)
+    cache.set("b", "B", size=40)
+    cache.get("a")
+    cache.set("c", "C", size=40)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.bytes == 80
+    assert cache.stats()["evictions"] == 1
+
+
+def test_replacing_a_key_frees_its_old_size():
+    cache = FragmentCache(max_bytes=100)
+    cache.set("a", "A", size=60)
+    cache.set("a", "A2", size=30)
+    assert cache.bytes == 30
+    assert cache.stats()["evictions"] == 0
+
+
+def test_values_larger_than_the_cache_are_not_stored():
+    cache = FragmentCache(max_bytes=100)
+    cache.set("a", "A", size=50)
+    cache.set("huge", "H", size=101)
+    assert cache.get("huge") is None
+    assert cache.get("a") == "A"
+
+
+def test_zero_max_bytes_disables_caching():
+    cache = FragmentCache(max_bytes=0)
+    cache.set("a", "page")
+    assert cache.get("a") is None
+    assert cache.bytes == 0
+
+
+def test_clear():
+    cache = FragmentCache()
+    cache.set("a", "page")
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.bytes == 0
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from group_commit import GroupCommitQueue
+
+
+def test_each_intent_gets_its_own_result_or_exception():
+    def apply_batch(intents):
+        return [ValueError(i) if i < 0 else i * 2 for i in intents]
+
+    queue = GroupCommitQueue(apply_batch, max_wait=0.01)
+    futures = [queue.submit(i) for i in (1, -1, 3)]
+    assert futures[0].result(5) == 2
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    assert futures[2].result(5) == 6
+
+
+def test_concurrent_writes_are_batched():
+    release = threading.Event()
+    batches = []
+
+    def apply_batch(intents):
+        # Hold the writer on the first batch so the rest pile up behind it
+        release.wait(5)
+        batches.append(list(intents))
+        return intents
+
+    queue = GroupCommitQueue(apply_batch, max_batch=64, max_wait=0.05)
+    futures = [queue.submit(i) for i in range(20)]
+    release.set()
+    assert [f.result(5) for f in futures] == list(range(20))
+    assert len(batches) < 20
+    assert sorted(i for batch in batches for i in batch) == list(range(20))
+    assert queue.stats()["writes"] == 20
+
+
+def test_a_failing_batch_fails_every_intent_in_it():
+    def apply_batch(intents):
+        raise RuntimeError("database is locked")
+
+    queue = GroupCommitQueue(apply_batch)
+    with pytest.raises(RuntimeError):
+        queue.submit("order").result(5)
+
+
+def test_cancelled_intents_are_skipped_and_running_ones_cannot_be_cancelled():
+    started, release = threading.Event(), threading.Event()
+    applied = []
+
+    def apply_batch(intents):
+        started.set()
+        release.wait(5)
+        applied.extend(intents)
+        return intents
+
+    queue = GroupCommitQueue(apply_batch, max_wait=0)
+    running = queue.submit("first")
+    started.wait(5)
+    queued = queue.submit("second")
+
+    assert not running.cancel()
+    assert queued.cancel()
+    release.set()
+    assert running.result(5) == "first"
+    assert queue.submit("third").result(5) == "third"
+    assert applied == ["first", "third"]
+    assert queue.stats()["cancelled"] == 1
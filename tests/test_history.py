@@ -0,0 +1,46 @@
+import pytest
+
+
+@pytest.fixture
+def trades(client, trade):
+    for i in range(5):
+        trade(client.user_id, "buy", "AAPL", i + 1)
+    return client
+
+
+def page(client, **args):
+    body = client.get("/history", query_string=dict(args, format="json")).get_json()
+    return [t["qty"] for t in body["transactions"]], body["next"]
+
+
+def test_pages_walk_back_by_cursor(trades):
+    qty, cursor = page(trades, limit=2)
+    assert qty == [5, 4]
+    qty, cursor = page(trades, limit=2, before=cursor)
+    assert qty == [3, 2]
+    qty, cursor = page(trades, limit=2, before=cursor)
+    assert (qty, cursor) == ([1], None)
+
+
+def test_an_exact_last_page_has_no_cursor(trades):
+    assert page(trades, limit=5) == ([5, 4, 3, 2, 1], None)
+
+
+def test_only_the_users_own_trades_are_listed(trades, sign_up, trade):
+    other = sign_up("other@example.com")
+    trade(other.user_id, "buy", "MSFT", 9)
+    assert page(trades, limit=10)[0] == [5, 4, 3, 2, 1]
+    assert page(other)[0] == [9]
+
+
+def test_limit_is_clamped(app, trades, monkeypatch):
+    monkeypatch.setitem(app.app.config, "HISTORY_MAX_PAGE_SIZE", 3)
+    assert page(trades, limit=0)[0] == [5]
+    assert page(trades, limit=1000)[0] == [5, 4, 3]
+    assert trades.get("/history?limit=lots").status_code == 400
+
+
+def test_html_page_links_to_the_older_page(trades):
+    html = trades.get("/history?limit=2").get_data(as_text=True)
+    assert "before=4" in html and "limit=2" in html
+    assert "Older" not in trades.get("/history?limit=2&before=2").get_data(as_text=True)
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import migrations
+
+OLD_SCHEMA = (
+    "CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR(100), password VARCHAR(100), "
+    "cash_in_hand INTEGER)",
+    "CREATE TABLE stock (id INTEGER PRIMARY KEY, name VARCHAR(100), qty INTEGER, price FLOAT, "
+    "owner_id INTEGER)",
+    "CREATE TABLE transcation (id INTEGER PRIMARY KEY, type VARCHAR(10), name VARCHAR(10), "
+    "qty INTEGER, owner_id INTEGER)",
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+    yield engine
+    engine.dispose()
+
+
+def indexes(engine, table):
+    with engine.connect() as conn:
+        return {row[1]: bool(row[2])
+                for row in conn.execute(text(f'PRAGMA index_list("{table}")'))}
+
+
+def test_apply_indexes_creates_every_index_and_is_idempotent(engine):
+    migrations.apply_indexes(engine)
+    migrations.apply_indexes(engine)
+    assert indexes(engine, "user") == {"ix_user_email": True}
+    assert indexes(engine, "stock") == {"uq_stock_owner_name": True}
+    assert indexes(engine, "transcation") == {"ix_transcation_owner_id_id": False}
+
+
+def test_duplicate_holdings_are_merged_before_the_unique_index(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO stock (id, name, qty, price, owner_id) VALUES "
+                          "(1, 'AAPL', 2, 10, 1), (2, 'AAPL', 3, 11, 1), (3, 'AAPL', 1, 12, 2)"))
+    migrations.apply_indexes(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, owner_id, qty FROM stock ORDER BY id")).all()
+    assert [tuple(r) for r in rows] == [(1, 1, 5), (3, 2, 1)]
+
+
+def test_duplicate_emails_are_renamed_and_the_index_made_unique(engine, capsys):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO user (id, email) VALUES "
+                          "(1, 'a@x.com'), (2, 'a@x.com'), (3, 'b@x.com')"))
+        # What an older upgrade left behind for such a database
+        conn.execute(text("CREATE INDEX ix_user_email ON user (email)"))
+    migrations.apply_indexes(engine)
+
+    with engine.connect() as conn:
+        emails = conn.execute(text("SELECT id, email FROM user ORDER BY id")).all()
+    assert [tuple(r) for r in emails] == [(1, "a@x.com"), (2, "a@x.com#duplicate-2"),
+                                          (3, "b@x.com")]
+    assert indexes(engine, "user") == {"ix_user_email": True}
+    assert "user 2" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(migrations.fcntl is None, reason="needs flock")
+def test_migration_lock_serializes_concurrent_upgrades(engine):
+    inside = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def first():
+        with migrations.migration_lock(engine):
+            order.append("first")
+            inside.set()
+            release.wait(5)
+        order.append("first released")
+
+    def second():
+        with migrations.migration_lock(engine):
+            order.append("second")
+
+    a = threading.Thread(target=first)
+    a.start()
+    inside.wait(5)
+    b = threading.Thread(target=second)
+    b.start()
+    b.join(0.2)
+    assert b.is_alive()
+    release.set()
+    a.join(5)
+    b.join(5)
+    assert order[0] == "first" and order[-1] == "second"
+
+
+def test_migration_lock_is_a_no_op_for_in_memory_databases():
+    with migrations.migration_lock(create_engine("sqlite://")):
+        pass
+
+
+def columns(engine, table):
+    with engine.connect() as conn:
+        return {row[1] for row in conn.execute(text(f'PRAGMA table_info("{table}")'))}
+
+
+def test_apply_columns_adds_missing_columns_and_backfills(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO stock (id, name, qty, price, owner_id) "
+                          "VALUES (1, 'AAPL', 2, 10.5, 1)"))
+    migrations.apply_columns(engine)
+    migrations.apply_columns(engine)
+
+    assert {"price", "cash_delta", "created_at"} <= columns(engine, "transcation")
+    assert {"avg_cost", "realized_pnl"} <= columns(engine, "stock")
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT avg_cost, realized_pnl FROM stock")).one()
+    assert tuple(row) == (10.5, 0)
+
+
+def test_apply_columns_does_not_backfill_existing_columns(engine):
+    migrations.apply_columns(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO stock (id, name, qty, price, owner_id, avg_cost, "
+                          "realized_pnl) VALUES (1, 'AAPL', 2, 10.5, 1, 9.0, 3.0)"))
+    migrations.apply_columns(engine)
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT avg_cost, realized_pnl FROM stock")).one()
+    assert tuple(row) == (9.0, 3.0)
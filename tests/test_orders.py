@@ -0,0 +1,177 @@
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app.app_context():
+        user = app.User(email="trader@example.com", password="x", cash_in_hand=500)
+        app.db.session.add(user)
+        app.db.session.commit()
+        return user.id
+
+
+def account(app, user_id):
+    """(cash, {symbol: qty}, number of ledger rows) for a user."""
+    with app.app.app_context():
+        user = app.db.session.get(app.User, user_id)
+        stock = {s.name: s.qty for s in user.stock}
+        trades = app.Transcation.query.filter_by(owner_id=user_id).count()
+        return user.cash_in_hand, stock, trades
+
+
+def test_buy_beyond_cash_is_rejected_without_writing(app, user_id):
+    with app.app.app_context(), pytest.raises(app.OrderRejected, match="balance"):
+        app.execute_order(user_id, "buy", "AAPL", 6, 100.0)
+    assert account(app, user_id) == (500, {}, 0)
+
+
+def test_oversell_is_rejected_without_writing(app, user_id):
+    with app.app.app_context():
+        app.execute_order(user_id, "buy", "AAPL", 2, 10.0)
+        with pytest.raises(app.OrderRejected, match="shares"):
+            app.execute_order(user_id, "sell", "AAPL", 3, 10.0)
+    assert account(app, user_id) == (480, {"AAPL": 2}, 1)
+
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_concurrent_buys_never_overdraw(app, user_id, monkeypatch, group_commit):
+    monkeypatch.setitem(app.app.config, "ORDER_GROUP_COMMIT", group_commit)
+    monkeypatch.setitem(app.app.config, "ORDER_RETRIES", 50)
+    monkeypatch.setitem(app.app.config, "ORDER_RETRY_BACKOFF", 0.001)
+    filled, rejected = [], []
+    start = threading.Barrier(80)
+
+    def buy():
+        start.wait()
+        with app.app.app_context():
+            try:
+                app.submit_order(user_id, "buy", "AAPL", 1, 10.0)
+                filled.append(1)
+            except app.OrderRejected:
+                rejected.append(1)
+
+    threads = [threading.Thread(target=buy) for _ in range(80)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (len(filled), len(rejected)) == (50, 30)
+    assert account(app, user_id) == (0, {"AAPL": 50}, 50)
+
+
+def locked():
+    return OperationalError("UPDATE user ...", {}, Exception("database is locked"))
+
+
+def test_locked_database_is_retried(app, user_id, monkeypatch):
+    monkeypatch.setitem(app.app.config, "ORDER_RETRY_BACKOFF", 0)
+    apply_order = app.apply_order
+    attempts = []
+
+    def flaky(*args):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise locked()
+        apply_order(*args)
+
+    monkeypatch.setattr(app, "apply_order", flaky)
+    with app.app.app_context():
+        app.execute_order(user_id, "buy", "AAPL", 1, 10.0)
+    assert len(attempts) == 3
+    assert account(app, user_id) == (490, {"AAPL": 1}, 1)
+
+
+def test_retries_give_up_and_other_errors_are_not_retried(app, user_id, monkeypatch):
+    monkeypatch.setitem(app.app.config, "ORDER_RETRIES", 2)
+    monkeypatch.setitem(app.app.config, "ORDER_RETRY_BACKOFF", 0)
+    attempts = []
+
+    def fail(error):
+        def apply_order(*args):
+            attempts.append(1)
+            raise error
+        return apply_order
+
+    monkeypatch.setattr(app, "apply_order", fail(locked()))
+    with app.app.app_context(), pytest.raises(OperationalError):
+        app.execute_order(user_id, "buy", "AAPL", 1, 10.0)
+    assert len(attempts) == 3
+
+    attempts.clear()
+    monkeypatch.setattr(app, "apply_order",
+                        fail(OperationalError("UPDATE", {}, Exception("disk I/O error"))))
+    with app.app.app_context(), pytest.raises(OperationalError):
+        app.execute_order(user_id, "buy", "AAPL", 1, 10.0)
+    assert len(attempts) == 1
+
+
+def test_positions_track_average_cost_and_realized_pnl(app, user_id):
+    ledger = [("buy", 2, 10.0), ("buy", 2, 20.0), ("sell", 3, 30.0),
+              ("sell", 1, 5.0), ("buy", 1, 7.0)]
+    with app.app.app_context():
+        with app.db.engine.begin() as conn:
+            for side, shares, price in ledger:
+                app.apply_order(conn, user_id, side, "AAPL", shares, price)
+        stock = app.Stock.query.filter_by(owner_id=user_id, name="AAPL").one()
+        trades = app.Transcation.query.filter_by(owner_id=user_id).order_by(app.Transcation.id)
+        rows = [(t.type, t.qty, t.price, t.cash_delta, t.created_at is not None)
+                for t in trades]
+        cash = app.db.session.get(app.User, user_id).cash_in_hand
+
+    # Buys average to 15; selling 3@30 realizes +45 and 1@5 realizes -10.
+    # The flat position then restarts its average at the next buy.
+    assert (stock.qty, stock.avg_cost, stock.realized_pnl) == (1, 7.0, 35.0)
+    assert cash == 500 + 28
+    assert rows == [("Bought", 2, 10.0, -20.0, True), ("Bought", 2, 20.0, -40.0, True),
+                    ("Sold", 3, 30.0, 90.0, True), ("Sold", 1, 5.0, 5.0, True),
+                    ("Bought", 1, 7.0, -7.0, True)]
+
+
+@pytest.fixture
+def stalled_writer(app, monkeypatch):
+    """Group commit on, with the writer held inside apply_batch until released."""
+    monkeypatch.setitem(app.app.config, "ORDER_GROUP_COMMIT", True)
+    monkeypatch.setitem(app.app.config, "ORDER_TIMEOUT", 0.2)
+    started, release = threading.Event(), threading.Event()
+    apply_batch = app.order_queue.apply_batch
+
+    def stalled(intents):
+        started.set()
+        release.wait(5)
+        return apply_batch(intents)
+
+    monkeypatch.setattr(app.order_queue, "apply_batch", stalled)
+    yield started, release
+    release.set()
+
+
+def test_order_still_being_written_at_the_timeout_is_reported_pending(app, client,
+                                                                      stalled_writer):
+    _, release = stalled_writer
+    app.polygon.prices["AAPL"] = 10.0
+    response = client.post("/buy", data={"symbol": "AAPL", "shares": "1"})
+    assert response.status_code == 503
+    assert b"check your history" in response.data
+
+    release.set()
+    app.order_queue.submit((client.user_id, "buy", "MSFT", 1, 1.0)).result(5)
+    assert account(app, client.user_id)[1] == {"AAPL": 1, "MSFT": 1}
+
+
+def test_order_still_queued_at_the_timeout_is_withdrawn(app, client, stalled_writer):
+    started, release = stalled_writer
+    blocker = app.order_queue.submit((client.user_id, "buy", "MSFT", 1, 1.0))
+    started.wait(5)
+    app.polygon.prices["AAPL"] = 10.0
+    response = client.post("/buy", data={"symbol": "AAPL", "shares": "1"})
+    assert response.status_code == 503
+    assert b"not placed" in response.data
+
+    release.set()
+    blocker.result(5)
+    app.order_queue.submit((client.user_id, "buy", "IBM", 1, 1.0)).result(5)
+    assert account(app, client.user_id)[1] == {"MSFT": 1, "IBM": 1}
@@ -0,0 +1,60 @@
+import pytest
+
+
+@pytest.fixture
+def holder(app, client):
+    app.polygon.prices.update(AAPL=10.0, MSFT=20.0)
+    client.post("/buy", data={"symbol": "AAPL", "shares": "2"})
+    return client
+
+
+def hits(app):
+    return app.fragment_cache.stats()["hits"]
+
+
+def test_home_is_served_from_cache_until_a_trade(app, holder):
+    first = holder.get("/home").get_data(as_text=True)
+    before, calls = hits(app), len(app.polygon.paths)
+    assert holder.get("/home").get_data(as_text=True) == first
+    assert hits(app) == before + 1
+    assert len(app.polygon.paths) == calls
+
+    holder.post("/buy", data={"symbol": "MSFT", "shares": "1"})
+    html = holder.get("/home").get_data(as_text=True)
+    assert 'data-symbol="MSFT"' in html and 'data-symbol="MSFT"' not in first
+    assert hits(app) == before + 1
+
+
+def test_home_is_rerendered_when_a_quote_is_refetched(app, holder):
+    holder.get("/home")
+    app.quote_cache.clear()
+    app.quote_client._grouped = None
+    app.polygon.prices["AAPL"] = 15.0
+    html = holder.get("/home").get_data(as_text=True)
+    assert '<td data-field="price">15.0</td>' in html
+
+
+def test_history_is_served_from_cache_until_a_trade(app, holder):
+    first = holder.get("/history").get_data(as_text=True)
+    before = hits(app)
+    assert holder.get("/history").get_data(as_text=True) == first
+    assert hits(app) == before + 1
+
+    holder.post("/sell", data={"symbol": "AAPL", "shares": "1"})
+    html = holder.get("/history").get_data(as_text=True)
+    assert "Sold" in html and "Sold" not in first
+
+
+def test_cached_pages_are_per_user(app, holder, sign_up):
+    holder.get("/home")
+    holder.get("/history")
+    other = sign_up("other@example.com")
+    assert 'data-symbol="AAPL"' not in other.get("/home").get_data(as_text=True)
+    assert "Bought" not in other.get("/history").get_data(as_text=True)
+
+
+def test_webp_and_plain_clients_get_separate_entries(app, holder):
+    holder.get("/home")
+    entries = app.fragment_cache.stats()["entries"]
+    holder.get("/home", headers={"Accept": "image/webp,*/*"})
+    assert app.fragment_cache.stats()["entries"] == entries + 1
@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from passwords import PasswordService, PasswordServiceBusy
+
+CHEAP = {"time_cost": 1, "memory_cost": 8, "parallelism": 1}
+
+
+@pytest.fixture
+def service():
+    service = PasswordService(workers=1, max_queue=2, **CHEAP)
+    yield service
+    if service._pool is not None:
+        service._pool.shutdown(cancel_futures=True)
+
+
+def test_hash_and_verify_round_trip(service):
+    hashed = service.hash("hunter2")
+    assert service.verify(hashed, "hunter2")
+    assert not service.verify(hashed, "wrong")
+    assert not service.verify("not-a-hash", "hunter2")
+    assert service.stats()["calls"] == 4
+
+
+def test_needs_rehash_when_parameters_change(service):
+    hashed = service.hash("hunter2")
+    assert not service.needs_rehash(hashed)
+    stronger = PasswordService(time_cost=2, memory_cost=8, parallelism=1)
+    assert stronger.needs_rehash(hashed)
+    assert stronger.needs_rehash("not-a-hash")
+
+
+def test_timed_out_work_keeps_its_slot_until_it_finishes(service, monkeypatch):
+    pending = []
+
+    class HeldPool:
+        """Jobs stay queued until the test resolves them."""
+
+        def submit(self, fn, *args):
+            future = Future()
+            pending.append(future)
+            return future
+
+    monkeypatch.setattr(service, "_executor", lambda: HeldPool())
+    service.timeout = 0.01
+    for _ in range(2):
+        with pytest.raises(PasswordServiceBusy, match="timed out"):
+            service.hash("x")
+    # Both timed-out jobs are still queued, so their slots are still taken
+    with pytest.raises(PasswordServiceBusy, match="busy"):
+        service.hash("x")
+    assert service.stats()["queue_depth"] == 2
+
+    for future in pending:
+        future.set_result("done")
+    assert service.stats()["queue_depth"] == 0
+    service.timeout = 5
+    pending.clear()
+    threading.Timer(0.05, lambda: pending[0].set_result("hashed")).start()
+    assert service.hash("x") == "hashed"
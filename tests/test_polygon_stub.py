@@ -0,0 +1,40 @@
+import random
+from datetime import date
+
+import pytest
+
+import polygon_stub
+
+
+@pytest.mark.parametrize("spec", ["fixed:5", "uniform:1:2", "normal:5:1",
+                                  "lognormal:40:0.5", "exponential:3"])
+def test_parse_latency_returns_non_negative_seconds(spec):
+    sample = polygon_stub.parse_latency(spec)
+    rng = random.Random(1)
+    assert all(sample(rng) >= 0 for _ in range(100))
+
+
+def test_parse_latency_rejects_unknown_distributions():
+    with pytest.raises(ValueError):
+        polygon_stub.parse_latency("bimodal:1:2")
+
+
+def test_bars_are_deterministic_and_consistent():
+    day = date(2024, 3, 8)
+    bar = polygon_stub.bar("AAPL", day)
+    assert bar == polygon_stub.bar("AAPL", day)
+    assert bar["l"] <= min(bar["o"], bar["c"]) <= max(bar["o"], bar["c"]) <= bar["h"]
+
+
+def test_prev_route_answers_like_polygon():
+    client = polygon_stub.create_app(symbols=("AAPL",)).test_client()
+    body = client.get("/v2/aggs/ticker/AAPL/prev").get_json()
+    assert body["status"] == "OK"
+    assert body["results"][0]["c"] > 0
+    # The stats request itself is counted too
+    assert client.get("/stub/stats").get_json()["requests"] == 2
+
+
+def test_error_rate_injects_server_errors():
+    client = polygon_stub.create_app(error_rate=1.0, seed=1).test_client()
+    assert client.get("/v2/aggs/ticker/AAPL/prev").status_code == 500
@@ -0,0 +1,109 @@
+import pytest
+
+from price_stream import PricePoller, Subscription
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    # Drive poll() by hand instead of from the background thread
+    monkeypatch.setattr(PricePoller, "_ensure_poller", lambda self: None)
+    calls = []
+    prices = {"AAPL": 1.0, "MSFT": 2.0, "IBM": 3.0}
+
+    def fetch(symbols):
+        calls.append(symbols)
+        return {symbol: prices.get(symbol) for symbol in symbols}
+
+    poller = PricePoller(fetch, interval=15)
+    poller.calls, poller.prices = calls, prices
+    return poller
+
+
+def test_subscription_coalesces_updates_per_symbol():
+    subscription = Subscription(["AAPL", "MSFT"])
+    subscription.publish({"AAPL": 1.0})
+    subscription.publish({"AAPL": 1.5, "MSFT": 2.0})
+    assert subscription.next(timeout=0) == {"AAPL": 1.5, "MSFT": 2.0}
+    assert subscription.next(timeout=0) == {}
+
+
+def test_one_fetch_serves_every_subscriber(poller):
+    a = poller.subscribe(["AAPL", "MSFT"])
+    b = poller.subscribe(["MSFT", "IBM"])
+    poller.poll(["AAPL", "IBM", "MSFT"])
+
+    assert poller.calls == [["AAPL", "IBM", "MSFT"]]
+    assert a.next(timeout=0) == {"AAPL": 1.0, "MSFT": 2.0}
+    assert b.next(timeout=0) == {"MSFT": 2.0, "IBM": 3.0}
+
+
+def test_only_changed_prices_are_published(poller):
+    subscription = poller.subscribe(["AAPL", "MSFT"])
+    poller.poll(["AAPL", "MSFT"])
+    subscription.next(timeout=0)
+    poller.prices["AAPL"] = 1.1
+    poller.poll(["AAPL", "MSFT"])
+    assert subscription.next(timeout=0) == {"AAPL": 1.1}
+    assert poller.stats()["published"] == 3
+
+
+def test_late_subscribers_get_the_latest_prices_at_once(poller):
+    poller.subscribe(["AAPL"])
+    poller.poll(["AAPL"])
+    late = poller.subscribe(["AAPL"])
+    assert late.next(timeout=0) == {"AAPL": 1.0}
+
+
+def test_symbols_are_watched_until_their_last_subscriber_leaves(poller):
+    a = poller.subscribe(["AAPL", "MSFT"])
+    b = poller.subscribe(["AAPL"])
+    poller.unsubscribe(a)
+    assert poller.stats()["symbols"] == 1
+    poller.unsubscribe(a)
+    poller.unsubscribe(b)
+    assert poller.stats()["symbols"] == 0
+    assert poller.stats()["subscribers"] == 0
+
+
+def test_subscribers_past_the_cap_are_rejected(poller):
+    poller.max_subscribers = 1
+    first = poller.subscribe(["AAPL"])
+    assert poller.subscribe(["AAPL"]) is None
+    poller.unsubscribe(first)
+    assert poller.subscribe(["AAPL"]) is not None
+    assert poller.stats()["rejected"] == 1
+
+
+def test_fetch_failures_are_survived(poller, capsys):
+    def failing(symbols):
+        raise RuntimeError("upstream down")
+
+    poller.fetch = failing
+    poller.subscribe(["AAPL"])
+    poller.poll(["AAPL"])
+    assert poller.stats()["polls"] == 0
+    assert "upstream down" in capsys.readouterr().out
+
+
+@pytest.fixture
+def holder(app, client):
+    app.polygon.prices["AAPL"] = 10.0
+    client.post("/buy", data={"symbol": "AAPL", "shares": "1"})
+    return client
+
+
+def test_stream_is_off_by_default(app, holder):
+    assert b"prices.js" not in holder.get("/home").data
+    assert holder.get("/prices/stream").status_code == 404
+
+
+def test_enabled_stream_is_served_to_holders(app, holder, monkeypatch):
+    monkeypatch.setitem(app.app.config, "PRICE_STREAM_ENABLED", True)
+    app.fragment_cache.clear()
+    assert b"prices.js" in holder.get("/home").data
+
+    response = holder.get("/prices/stream")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    response.close()
+    assert app.price_poller.stats()["subscribers"] == 0
@@ -0,0 +1,306 @@
+import threading
+import time
+from datetime import date
+
+import pytest
+
+import quotes
+from quotes import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(quotes.time, "monotonic", clock)
+    return clock
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("AAPL", 1.5)
+    clock.now += 10
+    assert cache.get("AAPL") == 1.5
+    clock.now += 0.1
+    assert cache.get("AAPL") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TTLCache(max_entries=2, ttl=10)
+    cache.set("A", 1)
+    cache.set("B", 2)
+    cache.get("A")
+    cache.set("C", 3)
+    assert cache.get("B") is None
+    assert cache.get("A") == 1
+    assert cache.get("C") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_delete_and_clear(clock):
+    cache = TTLCache()
+    cache.set("A", 1)
+    cache.set("B", 2)
+    cache.delete("A")
+    cache.delete("missing")
+    assert cache.get("A") is None
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_ttl_cache_stored_at_is_wall_time_of_the_last_set(clock, monkeypatch):
+    monkeypatch.setattr(quotes.time, "time", lambda: 1_700_000_000.0)
+    cache = TTLCache(ttl=10)
+    assert cache.stored_at("A") is None
+    cache.set("A", 1)
+    assert cache.stored_at("A") == 1_700_000_000.0
+    # Still reported once expired, for stale reads
+    clock.now += 60
+    assert cache.stored_at("A") == 1_700_000_000.0
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Stands in for requests.Session: answers GETs from a path -> response function."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.paths = []
+
+    def get(self, url, params=None, timeout=None):
+        path = url.split("://", 1)[-1].split("/", 1)[1]
+        self.paths.append("/" + path)
+        return self.respond("/" + path, params)
+
+    def close(self):
+        pass
+
+
+def client_with(respond):
+    client = quotes.QuoteClient("key", base_url="http://polygon.test")
+    client.session = FakeSession(respond)
+    return client
+
+
+def test_prev_close_returns_the_close():
+    client = client_with(lambda path, params: FakeResponse(
+        {"status": "OK", "results": [{"c": 12.5}]}))
+    assert client.prev_close("AAPL") == 12.5
+    assert client.session.paths == ["/v2/aggs/ticker/AAPL/prev"]
+
+
+def test_prev_close_is_none_for_unknown_symbols():
+    client = client_with(lambda path, params: FakeResponse({"status": "OK", "results": []}))
+    assert client.prev_close("NOPE") is None
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_upstream_failures_raise_instead_of_looking_like_unknown_symbols(status):
+    client = client_with(lambda path, params: FakeResponse({"status": "ERROR"}, status))
+    with pytest.raises(quotes.requests.HTTPError):
+        client.prev_close("AAPL")
+
+
+class FixedDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2024, 3, 11)  # a Monday
+
+
+def grouped_response(path, params):
+    day = path.rsplit("/", 1)[1]
+    if day == "2024-03-10":  # Sunday: no session
+        return FakeResponse({"status": "OK", "resultsCount": 0})
+    return FakeResponse({"status": "OK", "results": [
+        {"T": "AAPL", "c": 170.0}, {"T": "MSFT", "c": 400.0}, {"T": "IBM", "c": 190.0}]})
+
+
+def test_grouped_closes_walks_back_to_the_last_session(monkeypatch):
+    monkeypatch.setattr(quotes, "date", FixedDate)
+    client = client_with(grouped_response)
+    assert client.grouped_closes(["AAPL", "IBM", "NOPE"]) == {"AAPL": 170.0, "IBM": 190.0}
+    assert [p.rsplit("/", 1)[1] for p in client.session.paths] == ["2024-03-10", "2024-03-09"]
+
+
+def sessions_on(*days):
+    def respond(path, params):
+        if path.rsplit("/", 1)[1] in days:
+            return FakeResponse({"status": "OK", "results": [{"T": "AAPL", "c": 170.0}]})
+        return FakeResponse({"status": "OK", "resultsCount": 0})
+    return respond
+
+
+def test_grouped_closes_reuses_the_previous_weekdays_session(monkeypatch, clock):
+    monkeypatch.setattr(quotes, "date", FixedDate)
+    client = client_with(sessions_on("2024-03-08"))
+    client.grouped_closes(["AAPL"])
+    fetched = len(client.session.paths)
+    clock.now += 10 * client.GROUPED_RECHECK
+    assert client.grouped_closes(["AAPL", "MSFT"]) == {"AAPL": 170.0}
+    assert len(client.session.paths) == fetched
+
+
+def test_grouped_closes_rechecks_an_older_session(monkeypatch, clock):
+    # Friday was a holiday, or its closes weren't published yet
+    monkeypatch.setattr(quotes, "date", FixedDate)
+    client = client_with(sessions_on("2024-03-07"))
+    client.grouped_closes(["AAPL"])
+    fetched = len(client.session.paths)
+    client.grouped_closes(["AAPL"])
+    assert len(client.session.paths) == fetched
+    clock.now += client.GROUPED_RECHECK + 1
+    client.grouped_closes(["AAPL"])
+    assert len(client.session.paths) == 2 * fetched
+
+
+def test_fanout_returns_every_symbol_once():
+    fanout = quotes.QuoteFanout(max_workers=4, deadline=5)
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        return len(symbol)
+
+    try:
+        assert fanout.fetch(fetch, ["A", "BB", "A", "CCC"]) == {"A": 1, "BB": 2, "CCC": 3}
+    finally:
+        fanout.shutdown()
+    assert sorted(calls) == ["A", "BB", "CCC"]
+
+
+def test_fanout_gives_none_for_failures_and_symbols_past_the_deadline():
+    fanout = quotes.QuoteFanout(max_workers=2)
+    release = threading.Event()
+
+    def fetch(symbol):
+        if symbol == "SLOW":
+            release.wait(5)
+        if symbol == "BAD":
+            raise ValueError(symbol)
+        return 1.0
+
+    try:
+        assert fanout.fetch(fetch, ["OK", "BAD", "SLOW"], deadline=0.2) == {
+            "OK": 1.0, "BAD": None, "SLOW": None}
+    finally:
+        release.set()
+        fanout.shutdown()
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = quotes.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("AAPL", fetch, "AAPL")))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("AAPL", fetch, "AAPL")))
+                 for _ in range(3)]
+    for t in followers:
+        t.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert calls == ["AAPL"]
+    assert results == [42] * 4
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 3}
+
+
+def test_single_flight_shares_the_leaders_exception_and_then_forgets_it():
+    flight = quotes.SingleFlight()
+
+    def fail():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        flight.do("AAPL", fail)
+    assert flight.do("AAPL", lambda: 1) == 1
+
+
+def test_get_stale_ignores_the_ttl_up_to_max_age(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("AAPL", 1.5)
+    clock.now += 60
+    assert cache.get("AAPL") is None
+    assert cache.get_stale("AAPL", max_age=60) == 1.5
+    assert cache.get_stale("AAPL", max_age=59) is None
+
+
+def failing():
+    raise ConnectionError("upstream down")
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = quotes.CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(quotes.CircuitOpenError):
+        breaker.call(lambda: 1)
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_breaker_success_resets_the_failure_count(clock):
+    breaker = quotes.CircuitBreaker(failure_threshold=2)
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    breaker.call(lambda: 1)
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    assert breaker.state == breaker.CLOSED
+
+
+def test_breaker_counts_slow_calls_as_failures(clock):
+    breaker = quotes.CircuitBreaker(failure_threshold=1, slow_call_threshold=3)
+
+    def slow():
+        clock.now += 5
+        return 1
+
+    assert breaker.call(slow) == 1
+    assert breaker.state == breaker.OPEN
+
+
+def test_breaker_half_open_probe_closes_or_reopens(clock):
+    breaker = quotes.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    clock.now += 31
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    assert breaker.state == breaker.OPEN
+
+    clock.now += 31
+    assert breaker.call(lambda: 1) == 1
+    assert breaker.state == breaker.CLOSED
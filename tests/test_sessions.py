@@ -0,0 +1,120 @@
+import json
+import time
+
+import pytest
+from flask import Flask, session
+
+from sessions import CachedSessionStore, ServerSideSessionInterface, SQLiteSessionStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "sessions.sqlite3")
+
+
+def test_store_round_trip_and_expiry(path):
+    store = SQLiteSessionStore(path)
+    store.put("live", "{}", time.time() + 60)
+    store.put("dead", "{}", time.time() - 1)
+    assert store.get("live")[0] == "{}"
+    assert store.get("dead") is None
+    store.delete("live")
+    assert store.get("live") is None
+    assert store.expires("live") is None
+
+
+def test_purge_deletes_expired_rows(path):
+    store = SQLiteSessionStore(path, purge_interval=0)
+    store.put("dead", "{}", time.time() - 1)
+    store.put("live", "{}", time.time() + 60)
+    assert store.maybe_purge() == 0  # put() already purged the expired row
+    assert store.expires("dead") is None
+    assert store.expires("live") is not None
+
+
+def test_cached_store_writes_behind(path):
+    cached = CachedSessionStore(SQLiteSessionStore(path), flush_interval=60)
+    cached.put("sid", '{"user": 1}', time.time() + 60)
+    assert cached.get("sid")[0] == '{"user": 1}'
+    assert SQLiteSessionStore(path).get("sid") is None
+    cached.flush()
+    assert SQLiteSessionStore(path).get("sid")[0] == '{"user": 1}'
+
+
+def test_logout_in_one_worker_reaches_the_others(path):
+    # Two workers, each with its own cache over the same table
+    one = CachedSessionStore(SQLiteSessionStore(path), flush_interval=60)
+    two = CachedSessionStore(SQLiteSessionStore(path), flush_interval=60)
+    one.put("sid", '{"user": 1}', time.time() + 60)
+    one.flush()
+    assert two.get("sid") is not None
+
+    one.delete("sid")
+    assert two.get("sid") is None
+
+
+def test_a_rewrite_in_one_worker_reloads_the_others(path):
+    one = CachedSessionStore(SQLiteSessionStore(path), flush_interval=60)
+    two = CachedSessionStore(SQLiteSessionStore(path), flush_interval=60)
+    one.put("sid", '{"n": 1}', time.time() + 60)
+    one.flush()
+    two.get("sid")
+    one.put("sid", '{"n": 2}', time.time() + 120)
+    one.flush()
+    assert two.get("sid")[0] == '{"n": 2}'
+
+
+def test_flush_does_not_resurrect_a_deleted_session(path):
+    cached = CachedSessionStore(SQLiteSessionStore(path), flush_interval=60)
+    cached.put("sid", "{}", time.time() + 60)
+    cached.delete("sid")
+    cached.flush()
+    assert SQLiteSessionStore(path).get("sid") is None
+
+
+@pytest.fixture
+def app(path):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    store = SQLiteSessionStore(path)
+    app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session["value"] = value
+        return ""
+
+    @app.route("/login")
+    def login():
+        session.regenerate()
+        session["user"] = 1
+        return ""
+
+    @app.route("/logout")
+    def logout():
+        session.pop("user", None)
+        session.regenerate()
+        return ""
+
+    app.store = store
+    return app
+
+
+def test_login_rotates_the_session_id(app):
+    client = app.test_client()
+    client.get("/set/x")
+    planted = client.get_cookie("session").value
+    client.get("/login")
+    rotated = client.get_cookie("session").value
+    assert rotated != planted
+    assert app.store.get(planted) is None
+    assert json.loads(app.store.get(rotated)[0]) == {"value": "x", "user": 1}
+
+
+def test_logout_of_an_otherwise_empty_session_drops_the_cookie(app):
+    client = app.test_client()
+    client.get("/login")
+    sid = client.get_cookie("session").value
+    client.get("/logout")
+    assert app.store.get(sid) is None
+    assert client.get_cookie("session") is None
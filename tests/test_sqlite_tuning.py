@@ -0,0 +1,24 @@
+from sqlalchemy import create_engine, text
+
+from sqlite_tuning import apply_pragmas, engine_options
+
+
+def test_pragmas_apply_to_every_pooled_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite3'}",
+                           **engine_options(pool_size=2, busy_timeout_ms=1500))
+    apply_pragmas(engine, cache_size_kb=1234, busy_timeout_ms=1500)
+    try:
+        with engine.connect() as a, engine.connect() as b:
+            for conn in (a, b):
+                assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+                assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+                assert conn.execute(text("PRAGMA cache_size")).scalar() == -1234
+                assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1500
+    finally:
+        engine.dispose()
+
+
+def test_engine_options_convert_the_busy_timeout_to_seconds():
+    options = engine_options(pool_size=3, max_overflow=1, busy_timeout_ms=2500)
+    assert options["pool_size"] == 3
+    assert options["connect_args"] == {"check_same_thread": False, "timeout": 2.5}
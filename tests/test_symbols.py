@@ -0,0 +1,50 @@
+import os
+
+from symbols import BUNDLED_TICKERS, SymbolIndex, write_tickers
+
+ENTRIES = [
+    ("AAPL", "Apple Inc."),
+    ("AA", "Alcoa Corp"),
+    ("MSFT", "Microsoft Corp"),
+    ("APLE", "Apple Hospitality REIT"),
+    (" t ", "AT&T Inc."),
+    ("", "Nameless"),
+]
+
+
+def test_symbols_are_normalized():
+    index = SymbolIndex(ENTRIES)
+    assert len(index) == 5
+    assert "T" in index and "AAPL" in index
+    assert "aapl" not in index
+    assert index.name("MSFT") == "Microsoft Corp"
+
+
+def test_search_lists_symbol_matches_before_name_matches():
+    index = SymbolIndex(ENTRIES)
+    assert [s for s, _ in index.search("ap")] == ["APLE", "AAPL"]
+    assert [s for s, _ in index.search("a")] == ["AA", "AAPL", "APLE", "T"]
+    assert [s for s, _ in index.search("a", limit=2)] == ["AA", "AAPL"]
+    assert index.search("") == []
+    assert index.search("zz") == []
+
+
+def test_replace_swaps_the_whole_universe():
+    index = SymbolIndex(ENTRIES)
+    index.replace([("NVDA", "NVIDIA Corp")])
+    assert "AAPL" not in index
+    assert index.search("nv") == [("NVDA", "NVIDIA Corp")]
+
+
+def test_write_tickers_round_trips(tmp_path):
+    path = str(tmp_path / "tickers.csv")
+    write_tickers(path, [("MSFT", "Microsoft Corp"), ("AAPL", "Apple, Inc.")])
+    index = SymbolIndex.from_file(path)
+    assert index.source == path
+    assert index.search("AAP") == [("AAPL", "Apple, Inc.")]
+    assert os.listdir(tmp_path) == ["tickers.csv"]
+
+
+def test_bundled_universe_loads():
+    index = SymbolIndex.from_file(BUNDLED_TICKERS)
+    assert "AAPL" in index